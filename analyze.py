@@ -1,57 +1,392 @@
-def nodal_prob(base_attack,crit_prob,turns,memo,health):
-	"""
-	Thinking of the probability of destruction at specific healths of the enemy
-	as "nodes", this function computes the destruction probability for k turns.  It takes
-	the base attack of the attacker, a dictionarry of the critcal values whose values
-	are their probability.  It takes the turns you wish to compute for, an empty dictionarry
-	memo for memorization and the health of the defender which would be the node 
-	for which you specifically wish to compute probability for
-	"""
-
-	turns_left = turns - 1 #If 0 we dont want to call recursivley again
-
-	nodally_probular = 0 #Set the base probability for this node to be 0
-
-	for crit in crit_prob: #Look through the critical probabilitiess
-		total_damage = crit + base_attack
-		health_left = health - total_damage
-		if (base_attack,turns,health) not in memo:
-			"""
-			This if statement is to make sure we didnt already memmoize the 
-			probability for this specific instance
-			"""
-			
-			if total_damage == 0: #Did we do no damage? Then with that crit there is 0 prob
-				nodally_probular += 0
-			elif health_left <= 0: #Did we kill him? probility is one times the prob of this crit
-				nodally_probular += 1*crit_prob[crit]
-			elif turns_left > 0: #call recursion if we want to look any turns deeper
-				
-				nodally_probular += nodal_prob(base_attack,crit_prob,turns_left,memo,health_left) * crit_prob[crit]
+import numpy, itertools, math
+import cache, combat
+from collections import namedtuple
+
+# The chance of each amount being added to an attack's base damage
+CRIT_PROB = combat.DAMAGE_VARIANCE
+
+# Number of kill curves to keep around
+FORECAST_CACHE_SIZE = 256
+
+# Most attack orders to search through when several units attack one
+# defender. Past this, the strongest attacks are simply made first.
+MAX_FOCUS_STATES = 1024
+
+# The chances the forecast looks for the first turn to reach by default:
+# when destroying the defender becomes possible, and when it's all but
+# certain
+FORECAST_THRESHOLDS = (0.00005, 0.99995)
+
+# A summary of a kill curve.  expected, variance and median describe the
+# number of attacks needed to destroy the defender, and are None if it may
+# survive every attack in the curve.  first_turns holds the first number of
+# attacks whose kill chance reaches each threshold, or None if none does.
+ForecastSummary = namedtuple('ForecastSummary', ['expected',
+	'variance',
+	'median',
+	'thresholds',
+	'first_turns',
+	'curve'])
+
+# Kill curves shared by every unit, keyed by (base attack, health, crit
+# table, number of attacks)
+forecast_cache = cache.LRUCache(FORECAST_CACHE_SIZE)
+
+def attack_hp_dist(hp_dist, base_attack, crit_prob = CRIT_PROB):
+	"""
+	Takes hp_dist, an array whose entry h is the probability that the
+	defender has h health left, and returns the distribution after one more
+	attack, whose damage follows combat.damage_pmf.  Health 0 means
+	destroyed, and destroyed units stay destroyed.  Attacks doing at least
+	as much damage as the defender's health destroy it, however much they
+	overkill by.
+
+	>>> attack_hp_dist(numpy.array([0, 0, 0, 1.0]), 2).round(4).tolist()
+	[0.3, 0.5, 0.2, 0.0]
+	>>> attack_hp_dist(numpy.array([0, 0.5, 0.5]), 9).round(4).tolist()
+	[1.0, 0.0, 0.0]
+	"""
+	alive = hp_dist[1:]
+	result = numpy.zeros_like(hp_dist)
+	result[0] = hp_dist[0]
+
+	for damage, p in combat.damage_pmf(base_attack, crit_prob).items():
+		if damage == 0: #No damage, so nobody's health changes
+			result[1:] += p * alive
+		elif damage >= len(alive): #Destroyed at any health
+			result[0] += p * alive.sum()
 		else:
-			nodally_probular += memo[(base_attack,turns,health)] #We had it memoized already
+			#Units with no more health than the damage are destroyed, the
+			#rest lose health
+			result[0] += p * alive[:damage].sum()
+			result[1:len(alive) + 1 - damage] += p * alive[damage:]
+
+	return result
+
+def kill_curve(base_attack, hp, attacks, crit_prob = CRIT_PROB):
+	"""
+	Returns an array of length attacks + 1 whose entry k is the probability
+	that a defender with hp health is destroyed within k attacks of the
+	given base attack.  This tracks the distribution of the defender's
+	remaining health from attack to attack, so it takes O(attacks * hp) time.
+
+	>>> kill_curve(5, 10, 3).round(4).tolist()
+	[0.0, 0.0, 0.76, 1.0]
+	>>> kill_curve(0, 10, 2).tolist()
+	[0.0, 0.0, 0.0]
+	>>> kill_curve(9, 5, 1).round(4).tolist()
+	[0.0, 1.0]
+	"""
+	hp = max(int(hp), 0)
+
+	hp_dist = numpy.zeros(hp + 1)
+	hp_dist[hp] = 1
+
+	curve = numpy.empty(attacks + 1)
+	curve[0] = hp_dist[0]
+	for k in range(1, attacks + 1):
+		hp_dist = attack_hp_dist(hp_dist, base_attack, crit_prob)
+		curve[k] = hp_dist[0]
+
+	return curve
+
+def kill_curves(base_attacks, hps, attacks, crit_prob = CRIT_PROB):
+	"""
+	Works out many kill curves at once.  base_attacks and hps are arrays of
+	the same shape, and the result has an extra last axis of length
+	attacks + 1, where entry k is the probability that a defender with that
+	health is destroyed within k attacks of that base attack.  Every curve
+	is stepped forward together, so this is much faster than calling
+	kill_curve for each.
+
+	>>> curves = kill_curves(numpy.array([5, 0]), numpy.array([10, 10]), 2)
+	>>> curves.round(4).tolist()
+	[[0.0, 0.0, 0.76], [0.0, 0.0, 0.0]]
+	"""
+	base_attacks = numpy.asarray(base_attacks)
+	hps = numpy.maximum(numpy.asarray(hps, dtype = int), 0)
+	shape = base_attacks.shape
+	base_attacks = base_attacks.ravel()
+	hps = numpy.broadcast_to(hps, shape).ravel()
+
+	rows = numpy.arange(len(hps))
+	max_hp = int(hps.max()) if len(hps) else 0
+
+	#Each row is the health distribution of one defender
+	hp_dists = numpy.zeros((len(hps), max_hp + 1))
+	hp_dists[rows, hps] = 1
+
+	#The damage each crit does in each row, capped so it can be looked up
+	crits = list(crit_prob.items())
+	damages = [numpy.minimum(numpy.maximum(base_attacks + crit, 0), max_hp)
+		for crit, p in crits]
+	healths = numpy.arange(1, max_hp + 1)
+
+	curves = numpy.empty((len(hps), attacks + 1))
+	curves[:, 0] = hp_dists[:, 0]
+	for k in range(1, attacks + 1):
+		#The chance of having more than 0 and at most h health, for each h
+		alive_below = numpy.cumsum(hp_dists, axis = 1)
+		alive_below -= hp_dists[:, :1]
+
+		#Pad the distribution so health above the maximum reads as 0
+		padded = numpy.concatenate(
+			(hp_dists, numpy.zeros((len(hps), max_hp + 1))), axis = 1)
+
+		result = numpy.zeros_like(hp_dists)
+		result[:, 0] = hp_dists[:, 0]
+		for (crit, p), damage in zip(crits, damages):
+			#Defenders with no more health than the damage are destroyed,
+			#the rest end up with health h from h + damage
+			result[:, 0] += p * alive_below[rows, damage]
+			result[:, 1:] += p * numpy.take_along_axis(
+				padded, healths[None, :] + damage[:, None], axis = 1)
+
+		hp_dists = result
+		curves[:, k] = hp_dists[:, 0]
+
+	return curves.reshape(shape + (attacks + 1,))
+
+def cached_kill_curve(base_attack, hp, attacks, crit_prob = CRIT_PROB):
+	"""
+	Returns the same curve as kill_curve, reusing it from forecast_cache if
+	it has been worked out before.  The curve depends only on these
+	arguments, so any units with the same base attack against the same
+	health share it.  The returned array is shared, so it is read-only.
+
+	>>> forecast_cache.clear()
+	>>> a = cached_kill_curve(5, 10, 3)
+	>>> cached_kill_curve(5, 10, 3) is a
+	True
+	>>> a.flags.writeable
+	False
+	"""
+	key = (base_attack, max(int(hp), 0), tuple(sorted(crit_prob.items())),
+		attacks)
+
+	def create():
+		curve = kill_curve(base_attack, hp, attacks, crit_prob)
+		curve.flags.writeable = False
+		return curve
+
+	return forecast_cache.get_or_create(key, create)
+
+def focus_fire_curve(base_attacks, hp, crit_prob = CRIT_PROB):
+	"""
+	Returns an array of length len(base_attacks) + 1 whose entry k is the
+	probability that a defender with hp health is destroyed by the first k
+	of the given attacks, made in order.
+
+	>>> focus_fire_curve([6, 2], 6).round(4).tolist()
+	[0.0, 0.8, 1.0]
+	"""
+	hp = max(int(hp), 0)
+
+	hp_dist = numpy.zeros(hp + 1)
+	hp_dist[hp] = 1
+
+	curve = [hp_dist[0]]
+	for base_attack in base_attacks:
+		hp_dist = attack_hp_dist(hp_dist, base_attack, crit_prob)
+		curve.append(hp_dist[0])
+
+	return numpy.array(curve)
+
+def _best_type_order(base_attacks, hp, crit_prob):
+	"""
+	Searches for the order of the given attacks which destroys the defender
+	in the fewest attacks on average.  Returns the order as a tuple of base
+	attacks, along with its focus fire curve.
 
-	memo[(base_attack,turns,health)] = nodally_probular #memoize the result
-	if nodally_probular > 1: nodally_probular = 1 #If prob is bigger than one, we still killed it
-	return nodally_probular
+	The health left after a set of attacks doesn't depend on their order,
+	so each set is only worked out once.  Attacks with the same base attack
+	are interchangeable, so a set is just how many of each have been made.
+	"""
+	bases = sorted(set(base_attacks), reverse = True)
+	counts = [base_attacks.count(b) for b in bases]
+
+	states = itertools.product(*(range(c + 1) for c in counts))
+	if numpy.prod([c + 1 for c in counts]) > MAX_FOCUS_STATES:
+		#Too many to search, so make the strongest attacks first
+		order = tuple(sorted(base_attacks, reverse = True))
+		return order, focus_fire_curve(order, hp, crit_prob)
+
+	hp = max(int(hp), 0)
+	start = numpy.zeros(hp + 1)
+	start[hp] = 1
+
+	#The health distribution after each set of attacks, and the lowest
+	#expected number of attacks made to get there with the order used
+	hp_dists = {}
+	best = {}
+
+	#Sets are visited in an order where every smaller set comes first
+	for state in states:
+		if not any(state):
+			hp_dists[state] = start
+			best[state] = (0, ())
+			continue
+
+		for i, used in enumerate(state):
+			if not used: continue
+
+			prev = state[:i] + (used - 1,) + state[i + 1:]
+			if state not in hp_dists:
+				hp_dists[state] = attack_hp_dist(
+					hp_dists[prev], bases[i], crit_prob)
+
+			#This attack is only made if the defender is still alive
+			expected, order = best[prev]
+			expected += 1 - hp_dists[prev][0]
+			if state not in best or expected < best[state][0] - 1e-12:
+				best[state] = (expected, order + (bases[i],))
+
+	order = best[tuple(counts)][1]
+	return order, focus_fire_curve(order, hp, crit_prob)
+
+def best_attack_order(base_attacks, hp, crit_prob = CRIT_PROB):
+	"""
+	Picks the order for several attacks on one defender which destroys it in
+	the fewest attacks on average, leaving the rest free to do something
+	else.  The chance of destroying it with every attack doesn't depend on
+	the order.  Returns the order as a tuple of indices into base_attacks,
+	along with its focus fire curve.  Results are kept in forecast_cache.
+
+	>>> order, curve = best_attack_order([2, 6], 6)
+	>>> order, curve.round(4).tolist()
+	((1, 0), [0.0, 0.8, 1.0])
+	"""
+	key = ("focus", tuple(sorted(base_attacks)), max(int(hp), 0),
+		tuple(sorted(crit_prob.items())))
+
+	def create():
+		type_order, curve = _best_type_order(list(base_attacks), hp,
+			crit_prob)
+		curve.flags.writeable = False
+		return type_order, curve
+
+	type_order, curve = forecast_cache.get_or_create(key, create)
+
+	#Turn the order of base attacks back into indices
+	indices = {}
+	for i, base_attack in enumerate(base_attacks):
+		indices.setdefault(base_attack, []).append(i)
+	order = tuple(indices[base_attack].pop(0) for base_attack in type_order)
+
+	return order, curve
+
+def focus_fire_prob(attackers, defender, current_tile, ordered = False):
+	"""
+	focus_fire_prob works out the chance of several attackers destroying one
+	defender, each attacking once.  If ordered is true they attack in the
+	given order, otherwise in the order which destroys the defender soonest
+	on average.  Returns the attackers in the order they attack, and a list
+	whose entry k is the probability the defender is destroyed by the first
+	k attacks.
+	"""
+	base_attacks = [a.get_damage(defender,current_tile) for a in attackers]
+	hp = defender.health
+
+	if ordered:
+		order = range(len(attackers))
+		curve = focus_fire_curve(base_attacks, hp)
+	else:
+		order, curve = best_attack_order(base_attacks, hp)
+
+	return [attackers[i] for i in order], curve.tolist()
+
+def summarize_curve(curve, thresholds = FORECAST_THRESHOLDS):
+	"""
+	Returns a ForecastSummary of a kill curve, as returned by kill_curve.
+
+	>>> summary = summarize_curve(kill_curve(5, 10, 4))
+	>>> round(summary.expected, 4), round(summary.variance, 4)
+	(2.24, 0.1824)
+	>>> summary.median, summary.first_turns
+	(2, (2, 3))
+	"""
+	curve = numpy.asarray(curve)
+
+	#The curve never decreases, so the first turns can be searched for
+	first_turns = tuple(
+		int(k) if k < len(curve) else None
+		for k in numpy.searchsorted(curve, thresholds))
+
+	expected = variance = median = None
+	if curve[-1] >= 1 - 1e-9:
+		#The chance of needing exactly k attacks
+		pmf = numpy.diff(curve, prepend = 0)
+		turns = numpy.arange(len(curve))
+		expected = float((turns * pmf).sum())
+		variance = max(float((turns ** 2 * pmf).sum() - expected ** 2), 0.0)
+		median = int(numpy.searchsorted(curve, 0.5))
+
+	return ForecastSummary(expected, variance, median, tuple(thresholds),
+		first_turns, curve)
+
+def _certain_kill_turn(base_attack, hp, crit_prob):
+	"""
+	Returns the number of attacks which will destroy the defender whatever
+	the crits, or None if that depends on the crits.
+	"""
+	damages = combat.damage_pmf(base_attack, crit_prob)
+	least, most = min(damages), max(damages)
+	hp = max(int(hp), 0)
+
+	if least <= 0:
+		return 0 if hp == 0 else None
+
+	turns = math.ceil(hp / least)
+	if math.ceil(hp / most) != turns:
+		return None
+	return turns
+
+def forecast_summary(base_attack, hp, attacks,
+	thresholds = FORECAST_THRESHOLDS, crit_prob = CRIT_PROB):
+	"""
+	Returns a ForecastSummary of attacking a defender with hp health up to
+	the given number of times.  When every crit destroys the defender in
+	the same number of attacks the summary is worked out directly, without
+	building up the health distribution.  Summaries are kept in
+	forecast_cache.
+
+	>>> forecast_summary(20, 10, 30)[:5]
+	(1.0, 0.0, 1, (5e-05, 0.99995), (1, 1))
+	>>> forecast_summary(5, 10, 30).first_turns
+	(2, 3)
+	"""
+	key = ("summary", base_attack, max(int(hp), 0),
+		tuple(sorted(crit_prob.items())), attacks, tuple(thresholds))
+
+	def create():
+		turn = _certain_kill_turn(base_attack, hp, crit_prob)
+		if turn is None:
+			return summarize_curve(
+				cached_kill_curve(base_attack, hp, attacks, crit_prob),
+				thresholds)
+
+		curve = (numpy.arange(attacks + 1) >= turn).astype(float)
+		curve.flags.writeable = False
+		first = turn if turn <= attacks else None
+		if first is None:
+			return ForecastSummary(None, None, None, tuple(thresholds),
+				tuple(None for t in thresholds), curve)
+
+		return ForecastSummary(float(turn), 0.0, turn, tuple(thresholds),
+			tuple(turn if t > 0 else 0 for t in thresholds), curve)
+
+	return forecast_cache.get_or_create(key, create)
 
 def destroy_prob(attacker, defender, current_tile, turns):
 	"""
-	destroy_prob returns the an array of len(turns + 1).  Each k in the array is the 
+	destroy_prob returns the an array of len(turns + 2).  Each k in the array is the 
 	probability of destroying the defender in k turns taking into account defenses, tile 
 	defense bonus, attack power and critical attack probabilities
 	"""
-
-
 	base_attack = attacker.get_damage(defender,current_tile)
 	hp = defender.health
-	crit_prob = {-1:0.2, 0:0.5, 1:0.2, 2:0.1}
-	prob = [0]
-	memo = {}
-
-	for i in range(turns+1):
 
-		prob_i = nodal_prob(base_attack,crit_prob,i,memo,hp)
-		prob.append(prob_i)
+	prob = cached_kill_curve(base_attack, hp, turns + 1).tolist()
+	prob[0] = 0 #An attack has to be made to destroy anything
 
 	return prob
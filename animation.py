@@ -1,5 +1,6 @@
 import pygame
 from pygame.sprite import Sprite
+from images import ImageManager
 
 class Mode:
     Loop, OneShot = range(2)
@@ -11,22 +12,25 @@ class Animation(Sprite):
     
     def __init__(self, filename, frame_w, frame_h, rate, mode = Mode.Loop):
         """
-        Initialize the animation, loading the image from the given filename.
-        The animation will be of size frame_w x frame_h.
+        Initialize the animation, using the frames of the sprite sheet in the
+        given filename. The animation will be of size frame_w x frame_h.
         Rate is the rate of change of the frames, in frames per tick.
         Mode is the animation mode. Loop mode will loop over the animation,
         while OneShot mode will kill the sprite once it completes the animation.
         """
         Sprite.__init__(self)
         
-        # The base spritesheet.
-        self._base_image = pygame.image.load(filename)
+        # The frames of the spritesheet, shared by every animation using it.
+        self._frames = ImageManager.frames(filename, frame_w, frame_h)
         
         # Animation data
         self.mode = mode
         self.rate = rate
         self.frame = 0
         
+        # The pool to return to once a one-shot animation finishes, if any
+        self.pool = None
+        
         # Set the pygame-required parameters.
         self.image = None
         self.rect = pygame.Rect(0, 0, frame_w, frame_h)
@@ -40,15 +44,13 @@ class Animation(Sprite):
         >>> anim.get_frame_count()
         5
         """
-        return self._base_image.get_rect().w // self.rect.w
+        return len(self._frames)
         
     def _update_image(self):
         """
         Sets the image to the correct sprite frame.
         """
-        w, h = self.rect.size
-        subrect = pygame.Rect(w * int(self.frame), 0, w, h)
-        self.image = self._base_image.subsurface(subrect)
+        self.image = self._frames[int(self.frame)]
         
     def update(self):
         """
@@ -64,6 +66,10 @@ class Animation(Sprite):
             # Kill the animation once it's done
             self.frame = 0
             self.kill()
+            
+            # Let it be reused
+            if self.pool:
+                self.pool.release(self)
         
         # Update the actual image
         self._update_image()
@@ -73,3 +79,4 @@ class Animation(Sprite):
         Resets the animation to its first frame.
         """
         self.frame = 0
+        self._update_image()
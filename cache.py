@@ -0,0 +1,95 @@
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    A bounded mapping which discards its least recently used entries once it
+    grows past its maximum size. Keeps count of hits and misses so the cache
+    size can be tuned.
+
+    >>> c = LRUCache(2)
+    >>> c.put("a", 1)
+    >>> c.put("b", 2)
+    >>> c.get("a")
+    1
+    >>> c.put("c", 3)
+    >>> "b" in c
+    False
+    >>> c.get("b") is None
+    True
+    >>> c.hits, c.misses
+    (1, 1)
+    >>> len(c)
+    2
+    """
+
+    def __init__(self, max_size):
+        """
+        max_size: the maximum number of entries to keep
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default = None):
+        """
+        Returns the value stored under key, marking it as recently used.
+        Returns default if the key isn't cached.
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value under key, evicting the oldest entries if necessary.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last = False)
+
+    def get_or_create(self, key, create):
+        """
+        Returns the value stored under key. If there isn't one, create() is
+        called to make it and the result is stored.
+
+        >>> c = LRUCache(4)
+        >>> c.get_or_create("x", lambda: 5)
+        5
+        >>> c.get_or_create("x", lambda: 6)
+        5
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        """
+        Removes an entry if it exists.
+        """
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries. The hit and miss counters are kept.
+        """
+        self._entries.clear()
+
+# Marks a missing entry, since None is a valid value to cache
+_MISSING = object()
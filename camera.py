@@ -0,0 +1,108 @@
+import pygame
+import helper
+
+class Camera:
+    """
+    Keeps track of which part of the map is shown in the view. Maps which
+    fit inside the view are centred in it; larger maps can be scrolled.
+
+    >>> c = Camera(pygame.Rect(0, 0, 600, 600), 200, 100)
+    >>> c.origin
+    (200, 250)
+    >>> c = Camera(pygame.Rect(0, 0, 600, 600), 2000, 1000)
+    >>> c.scroll(100, 50)
+    >>> c.origin
+    (-100, -50)
+    >>> c.scroll(-500, 5000)
+    >>> c.origin
+    (0, -400)
+    >>> c.visible_area()
+    <rect(0, 400, 600, 600)>
+    """
+
+    def __init__(self, view_rect, map_w, map_h):
+        """
+        view_rect: the screen rectangle the map is shown in
+        map_w: the width of the map, in pixels
+        map_h: the height of the map, in pixels
+        """
+        self.view_rect = view_rect.copy()
+        self.map_w = map_w
+        self.map_h = map_h
+
+        # How far the map is scrolled, in map pixels
+        self.x = 0
+        self.y = 0
+
+    @property
+    def origin(self):
+        """
+        The screen position of the map's top-left corner.
+        """
+        view = self.view_rect
+
+        # Centre the map along axes where it fits in the view
+        if self.map_w <= view.w:
+            x = view.centerx - self.map_w // 2
+        else:
+            x = view.x - self.x
+
+        if self.map_h <= view.h:
+            y = view.centery - self.map_h // 2
+        else:
+            y = view.y - self.y
+
+        return (x, y)
+
+    def set_map_size(self, map_w, map_h):
+        """
+        Changes the size of the map being viewed, in pixels. The scroll
+        position is kept inside the new map.
+        """
+        self.map_w = map_w
+        self.map_h = map_h
+        self.scroll(0, 0)
+
+    def scroll(self, dx, dy):
+        """
+        Scrolls the view by the given number of pixels, stopping at the
+        edges of the map.
+        """
+        self.scroll_to(self.x + dx, self.y + dy)
+
+    def scroll_to(self, x, y):
+        """
+        Scrolls so that the given map pixel is at the top-left of the view,
+        stopping at the edges of the map.
+        """
+        self.x = int(helper.clamp(x, 0, max(self.map_w - self.view_rect.w, 0)))
+        self.y = int(helper.clamp(y, 0, max(self.map_h - self.view_rect.h, 0)))
+
+    def center_on(self, x, y):
+        """
+        Scrolls so that the given map pixel is in the centre of the view.
+        """
+        self.scroll_to(x - self.view_rect.w // 2, y - self.view_rect.h // 2)
+
+    def to_screen(self, x, y):
+        """
+        Converts map pixel coordinates into screen coordinates.
+        """
+        origin_x, origin_y = self.origin
+        return (x + origin_x, y + origin_y)
+
+    def to_map(self, x, y):
+        """
+        Converts screen coordinates into map pixel coordinates.
+        """
+        origin_x, origin_y = self.origin
+        return (x - origin_x, y - origin_y)
+
+    def visible_area(self):
+        """
+        Returns the rectangle of the map, in map pixels, which is inside
+        the view.
+        """
+        origin_x, origin_y = self.origin
+        area = self.view_rect.move(-origin_x, -origin_y)
+        return area.clip(pygame.Rect(0, 0, self.map_w, self.map_h))
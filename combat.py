@@ -0,0 +1,184 @@
+import numpy
+from unit.base_unit import UnitClass
+
+# The chance of each amount being added to an attack's base damage
+DAMAGE_VARIANCE = {-1: 0.2, 0: 0.5, 1: 0.2, 2: 0.1}
+
+# Used for rolls when no generator is given
+rng = numpy.random.default_rng()
+
+def damage_pmf(base_damage, variance = DAMAGE_VARIANCE):
+    """
+    Returns a dictionary of each amount of damage an attack with the given
+    base damage can do, and its probability. Attacks never do negative
+    damage.
+    
+    >>> damage_pmf(4)
+    {3: 0.2, 4: 0.5, 5: 0.2, 6: 0.1}
+    >>> damage_pmf(0)
+    {0: 0.7, 1: 0.2, 2: 0.1}
+    """
+    pmf = {}
+    for offset, p in variance.items():
+        damage = max(base_damage + offset, 0)
+        pmf[damage] = pmf.get(damage, 0) + p
+    return pmf
+    
+def damage_range(base_damage, variance = DAMAGE_VARIANCE):
+    """
+    Returns the least and most damage an attack with the given base damage
+    can do.
+    
+    >>> damage_range(4)
+    (3, 6)
+    """
+    pmf = damage_pmf(base_damage, variance)
+    return (min(pmf), max(pmf))
+    
+def sample_damage(base_damage, n, generator = None,
+                  variance = DAMAGE_VARIANCE):
+    """
+    Returns an array of n random damage rolls for attacks with the given
+    base damage, drawn with the given NumPy Generator (or the module's
+    shared one). Over many rolls the damage follows damage_pmf.
+    
+    >>> rolls = sample_damage(4, 100000, numpy.random.default_rng(1))
+    >>> int(rolls.min()), int(rolls.max())
+    (3, 6)
+    >>> bool(abs((rolls == 4).mean() - 0.5) < 0.01)
+    True
+    >>> sample_damage(4, 3, variance = {1: 1.0}).tolist()
+    [5, 5, 5]
+    """
+    generator = generator or rng
+    offsets = generator.choice(list(variance), size = n,
+                               p = list(variance.values()))
+    return numpy.maximum(base_damage + offsets, 0)
+    
+def roll_damage(base_damage, generator = None, variance = DAMAGE_VARIANCE):
+    """
+    Returns the damage done by one attack with the given base damage.
+    """
+    return int(sample_damage(base_damage, 1, generator, variance)[0])
+    
+# Marks attacker and defender pairs in a DamageTable which can't be attacked
+CANNOT_HIT = -1
+
+class DamageTable:
+    """
+    The base damage of every type of unit against every other type, on each
+    type of tile, worked out once from one unit of each type. Targets which
+    can't be hit are marked with CANNOT_HIT. The table is rebuilt the next
+    time it's used after a unit type is added, removed or replaced, or a
+    unit class or one of its methods is changed.
+    
+    >>> import unit, terrain
+    >>> from unit import *
+    >>> table = DamageTable(unit.unit_types, terrain.tile_types)
+    >>> table.damage("Tank", "Jeep", 0), table.damage("Tank", "Jeep", 6)
+    (6, 4)
+    >>> table.damage("Tank", "Fighter", 0) == CANNOT_HIT
+    True
+    >>> unit.unit_types["Hovercraft"] = unit.unit_types["Jeep"]
+    >>> table.damage("Tank", "Hovercraft", 0)
+    6
+    >>> del unit.unit_types["Hovercraft"]
+    >>> Tank = unit.unit_types["Tank"]
+    >>> init = Tank.__init__
+    >>> def stronger(self, **keywords):
+    ...     init(self, **keywords)
+    ...     self.damage += 2
+    >>> Tank.__init__ = stronger
+    >>> table.damage("Tank", "Jeep", 0)
+    8
+    >>> Tank.__init__ = init
+    >>> table.damage("Tank", "Jeep", 0)
+    6
+    """
+    
+    def __init__(self, unit_types, tile_types):
+        """
+        unit_types: a dictionary of unit classes by name
+        tile_types: a dictionary of tile data by tile ID
+        """
+        self._unit_types = unit_types
+        self._tile_types = tile_types
+        self._build()
+        
+    def _build(self):
+        """
+        Works out every entry of the table.
+        """
+        # What the unit types were when the table was worked out
+        self._version = UnitClass.version
+        self._types = dict(self._unit_types)
+        
+        self.names = sorted(self._unit_types)
+        self._index = {self._unit_types[name]: i
+                       for i, name in enumerate(self.names)}
+        self._name_index = {name: i for i, name in enumerate(self.names)}
+        
+        prototypes = [self._unit_types[name](team = 0) for name in self.names]
+        
+        # The full health of each type
+        self.max_health = numpy.array([p.max_health for p in prototypes])
+        tile_count = max(self._tile_types) + 1
+        
+        table = numpy.full((len(prototypes), len(prototypes), tile_count),
+                           CANNOT_HIT,
+                           dtype = numpy.int16)
+        
+        for a, attacker in enumerate(prototypes):
+            for d, defender in enumerate(prototypes):
+                if not attacker.can_hit(defender): continue
+                
+                for tile_id, tile in self._tile_types.items():
+                    table[a, d, tile_id] = attacker.get_damage(defender, tile)
+        
+        table.flags.writeable = False
+        self._table = table
+        
+    def refresh(self):
+        """
+        Rebuilds the table if any unit type has changed since it was built.
+        Checking only compares a counter and the unit types, so it's quick
+        enough to do on every lookup.
+        """
+        if (UnitClass.version != self._version or
+            self._types != self._unit_types):
+            self._build()
+        
+    @property
+    def array(self):
+        """
+        The table as a read-only array indexed by (attacker index, defender
+        index, tile ID), for looking up many entries at once.
+        """
+        self.refresh()
+        return self._table
+        
+    def index_of(self, u):
+        """
+        Returns the index of a unit's type in the table.
+        """
+        return self._index[u.__class__]
+        
+    def damage(self, attacker_name, defender_name, tile_id):
+        """
+        Returns the base damage of one unit type against another standing on
+        the given type of tile, or CANNOT_HIT.
+        """
+        self.refresh()
+        return int(self._table[self._name_index[attacker_name],
+                               self._name_index[defender_name],
+                               tile_id])
+        
+    def unit_damage(self, attacker, defender, tile_id):
+        """
+        Returns the base damage of one unit against another standing on the
+        given type of tile, or CANNOT_HIT.
+        """
+        self.refresh()
+        return int(self._table[self._index[attacker.__class__],
+                               self._index[defender.__class__],
+                               tile_id])
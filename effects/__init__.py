@@ -2,5 +2,15 @@ from effects.explosion import Explosion
 from effects.ricochet import Ricochet
 from effects.wormhole import Wormhole
 from effects.reverse_wormhole import Reverse_Wormhole
+from effects.pool import EffectPool
 
-__all__ = ["explosion", "ricochet", "wormhole", "reverse_wormhole"]
+# Each effect by name. Units refer to their effects by these names, so that
+# the rules of the game don't depend on the graphics.
+effect_types = {
+    "Explosion": Explosion,
+    "Ricochet": Ricochet,
+    "Wormhole": Wormhole,
+    "Reverse_Wormhole": Reverse_Wormhole
+}
+
+__all__ = ["explosion", "ricochet", "wormhole", "reverse_wormhole", "pool"]
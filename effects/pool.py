@@ -0,0 +1,107 @@
+# Number of finished effects kept for reuse, per effect class
+DEFAULT_POOL_SIZE = 16
+
+class EffectPool:
+    """
+    Recycles one-shot effects. Finished effects are returned to the pool,
+    and acquiring another effect of the same class just resets and moves a
+    finished one instead of constructing a new one.
+    
+    >>> from effects.explosion import Explosion
+    >>> pool = EffectPool()
+    >>> first = pool.acquire(Explosion, (0, 0))
+    >>> for i in range(first.get_frame_count() * 5):
+    ...     first.update()
+    >>> second = pool.acquire(Explosion, (40, 20))
+    >>> second is first
+    True
+    >>> second.rect.topleft
+    (40, 20)
+    >>> pool.stats()
+    {'created': 1, 'reused': 1, 'released': 1, 'dropped': 0}
+    """
+    
+    def __init__(self, default_size = DEFAULT_POOL_SIZE, sizes = None):
+        """
+        default_size: how many finished effects of each class to keep
+        sizes: a dictionary of effect classes to pool sizes, overriding
+               the default for those classes
+        """
+        self.default_size = default_size
+        self.sizes = dict(sizes) if sizes else {}
+        
+        # Finished effects, by class
+        self._free = {}
+        
+        # Counters for tuning the pool sizes
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.dropped = 0
+        
+    def get_size(self, effect_class):
+        """
+        Returns how many finished effects of the given class will be kept.
+        """
+        return self.sizes.get(effect_class, self.default_size)
+        
+    def set_size(self, effect_class, size):
+        """
+        Changes how many finished effects of the given class will be kept,
+        dropping any which no longer fit.
+        """
+        self.sizes[effect_class] = size
+        
+        free = self._free.get(effect_class, [])
+        if len(free) > size:
+            self.dropped += len(free) - size
+            del free[size:]
+            
+    def free_count(self, effect_class):
+        """
+        Returns the number of finished effects of the given class which are
+        waiting to be reused.
+        """
+        return len(self._free.get(effect_class, []))
+        
+    def acquire(self, effect_class, pos):
+        """
+        Returns an effect of the given class with its top-left corner at pos,
+        reusing a finished one if there is one.
+        """
+        free = self._free.get(effect_class)
+        
+        if free:
+            effect = free.pop()
+            effect.reset()
+            effect.rect.topleft = pos
+            self.reused += 1
+        else:
+            effect = effect_class(pos)
+            effect.pool = self
+            self.created += 1
+            
+        return effect
+        
+    def release(self, effect):
+        """
+        Returns a finished effect to the pool. If the pool for its class is
+        already full, the effect is dropped.
+        """
+        effect_class = effect.__class__
+        free = self._free.setdefault(effect_class, [])
+        
+        if len(free) < self.get_size(effect_class):
+            free.append(effect)
+            self.released += 1
+        else:
+            self.dropped += 1
+            
+    def stats(self):
+        """
+        Returns a dictionary of the pool's counters.
+        """
+        return {'created': self.created,
+                'reused': self.reused,
+                'released': self.released,
+                'dropped': self.dropped}
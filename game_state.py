@@ -0,0 +1,328 @@
+"""
+The rules of a game in progress: the map, the units on it, whose turn it is,
+and the moves, attacks and turn changes players make. Nothing here needs
+pygame, so games can be simulated without a display; gui.GUI shows one and
+turns clicks into these actions.
+"""
+import unit, combat, level, terrain
+from unit import *
+from unit.base_unit import UnitRoster
+from collections import namedtuple
+
+# What happened when a unit attacked: the unit attacked, the damage done,
+# and whether it was destroyed
+AttackResult = namedtuple('AttackResult', ['target', 'damage', 'destroyed'])
+
+def check_unit_names(records):
+    """
+    Raises an exception if any of the given unit records names a unit type
+    which doesn't exist.
+
+    >>> check_unit_names([level.UnitRecord("Hovercraft", 0, 0, 0, 0)])
+    Traceback (most recent call last):
+    ...
+    Exception: No unit of name Hovercraft found!
+    """
+    for record in records:
+        if not record.name in unit.unit_types:
+            raise Exception(
+                "No unit of name {} found!".format(record.name))
+
+class GameState:
+    """
+    A game being played on a map by a number of teams, which take turns.
+    Each turn every unit on the current team can move once and attack once.
+
+    Each game keeps its own roster of units, so any number of games can be
+    played side by side.
+
+    >>> t = terrain.TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0] * 8] * 3)
+    >>> game = GameState(t, 2)
+    >>> tank = game.add_unit(level.UnitRecord("Tank", 0, 0, 1, 0))
+    >>> jeep = game.add_unit(level.UnitRecord("Jeep", 1, 7, 1, 180))
+    >>> (7, 1) in game.attack_options(tank)[1]
+    False
+    >>> game.move(tank, (3, 1))
+    [(0, 1), (1, 1), (2, 1), (3, 1)]
+    >>> game.attack_options(tank)[1]
+    {(7, 1)}
+    >>> import numpy
+    >>> result = game.attack(tank, (7, 1), numpy.random.default_rng(0))
+    >>> result.target is jeep, result.damage, jeep.health
+    (True, 6, 9)
+    >>> game.end_turn()
+    []
+    >>> game.cur_team, game.cur_day
+    (1, 1)
+    >>> other = GameState(t, 2)
+    >>> len(other.units), len(game.units), other.unit_at((3, 1))
+    (0, 2, None)
+    """
+
+    def __init__(self, terrain_map, num_teams):
+        """
+        terrain_map: the TerrainMap the game is played on
+        num_teams: the number of teams taking turns
+        """
+        self.map = terrain_map
+        self.num_teams = num_teams
+        self.current_turn = 0
+        self.win_team = None
+
+        # The units in play, starting with none
+        self.units = UnitRoster()
+
+    @classmethod
+    def from_level(cls, filename, terrain_map = None):
+        """
+        Starts the game in the given .lvl file, with all of its units. The
+        level's map is loaded into terrain_map if one is given, or else
+        into a new TerrainMap. Binary and GIF maps are read without pygame,
+        but other image maps need it; convert them with mapconvert.py to
+        simulate without pygame installed.
+
+        >>> game = GameState.from_level("maps/demo.lvl")
+        >>> game.map.get_map_size(), len(game.units), game.num_teams
+        ((30, 30), 18, 1)
+        >>> game.map.tile_data((0, 0)).type
+        'water'
+
+        The bundled levels load without pygame:
+
+        >>> import subprocess, sys
+        >>> subprocess.run([sys.executable, "-c",
+        ...     "import sys, game_state; "
+        ...     "game_state.GameState.from_level('maps/island.lvl'); "
+        ...     "print('pygame' in sys.modules)"],
+        ...     capture_output = True, text = True).stdout.split()
+        ['False']
+        """
+        lvl = level.load_level(filename)
+
+        if terrain_map is not None:
+            terrain_map.load_from_file(lvl.map_filename)
+        else:
+            terrain_map = terrain.TerrainMap(lvl.tile_sheet,
+                                             lvl.tile_width,
+                                             lvl.tile_height)
+            if (terrain.is_binary_map(lvl.map_filename) or
+                terrain.is_gif_map(lvl.map_filename)):
+                terrain_map.load_from_file(lvl.map_filename)
+            else:
+                # Only other image maps need pygame, so it's only loaded for
+                # them
+                import tiles
+                terrain_map.load_grid(tiles.read_image_map(lvl.map_filename))
+
+        # The units may still be being read from the level file, so each is
+        # checked as it's read
+        game = cls(terrain_map, lvl.num_teams)
+        for record in lvl.units:
+            check_unit_names((record,))
+            game.add_unit(record)
+        return game
+
+    @property
+    def cur_team(self):
+        """
+        Gets the current team based on the turn.
+        """
+        return (self.current_turn) % self.num_teams
+
+    @property
+    def cur_day(self):
+        """
+        Gets the current day based on the turn.
+        """
+        return (self.current_turn) // self.num_teams + 1
+
+    @property
+    def game_over(self):
+        """
+        Whether a team has won.
+        """
+        return self.win_team is not None
+
+    def add_unit(self, record):
+        """
+        Puts the unit described by a level.UnitRecord into play, returning
+        the new unit.
+        """
+        return unit.unit_types[record.name](team = record.team,
+                                            tile_x = record.x,
+                                            tile_y = record.y,
+                                            activate = True,
+                                            angle = record.angle,
+                                            roster = self.units)
+
+    def unit_at(self, pos):
+        """
+        Returns the unit at the given tile position, or None if there isn't
+        one.
+        """
+        return self.units.unit_at(pos)
+
+    def can_move(self, u):
+        """
+        Returns whether the given unit can still move this turn.
+        """
+        return not u.turn_state[0]
+
+    def can_attack(self, u):
+        """
+        Returns whether the given unit can still attack this turn.
+        """
+        return not u.turn_state[1]
+
+    def _path_rules(self, u):
+        """
+        Returns the cost and passable functions for pathfinding with the
+        given unit.
+        """
+        cost = lambda c: u.move_cost(self.map.tile_data(c))
+        passable = lambda c: u.is_passable(self.map.tile_data(c), c)
+        return cost, passable
+
+    def move_options(self, u):
+        """
+        Returns the set of tile positions the given unit can move to.
+        """
+        cost, passable = self._path_rules(u)
+        reachable = terrain.reachable_tiles(
+            self.map,
+            u.tile_pos,
+            u.speed,
+            cost,
+            passable)
+
+        # Check that the tiles can actually be stopped in
+        return set(pos for pos in reachable
+                   if u.is_stoppable(self.map.tile_data(pos), pos))
+
+    def attack_options(self, u):
+        """
+        Returns the set of tile positions in range of the given unit's
+        attack, and the set of those it can actually attack.
+        """
+        # Get information about the unit and its location.
+        unit_pos = u.tile_pos
+        unit_tile = self.map.tile_data(unit_pos)
+
+        # These are all the positions in range of the unit's attack.
+        in_range = u.positions_in_range(unit_tile, unit_pos)
+
+        # Look up all of those tiles at once
+        check_positions = list(in_range)
+        tile_ids = self.map.query_tiles(check_positions).ids.tolist()
+
+        # Determine which tiles the unit can actually attack. Tiles off the
+        # map never can be.
+        targets = set()
+        for check_pos, tile_id in zip(check_positions, tile_ids):
+            if tile_id < 0: continue
+
+            if u.is_attackable(unit_tile,
+                               unit_pos,
+                               terrain.tile_types[tile_id],
+                               check_pos):
+                targets.add(check_pos)
+
+        return in_range, targets
+
+    def move(self, u, pos, animate = False):
+        """
+        Moves the given unit to a position it can move to, returning the
+        path it takes. The unit is put straight there unless animate is
+        true, in which case it follows the path as it's updated each frame.
+        """
+        if not self.can_move(u):
+            raise ValueError("{} has already moved".format(u.type))
+
+        # Find the way there, and make sure it's within the unit's reach
+        cost, passable = self._path_rules(u)
+        path = terrain.find_path(self.map, u.tile_pos, pos, cost, passable)
+        if (not path or
+            sum(cost(c) for c in path[:-1]) > u.speed or
+            not u.is_stoppable(self.map.tile_data(pos), pos)):
+            raise ValueError("{} can't move to {}".format(u.type, pos))
+
+        # Mark that the unit has moved
+        u.turn_state[0] = True
+
+        if animate:
+            u.set_path(list(path))
+        else:
+            u.move_to(path)
+
+        return path
+
+    def attack(self, u, pos, generator = None):
+        """
+        Has the given unit attack the unit at pos, rolling the damage with
+        the given NumPy Generator (or combat's shared one). Returns an
+        AttackResult. If no units are left on other teams, the attacker's
+        team wins.
+        """
+        if not self.can_attack(u):
+            raise ValueError("{} has already attacked".format(u.type))
+
+        # Get info about the attackee
+        target = self.unit_at(pos)
+        target_tile = self.map.tile_data(pos)
+        if not u.is_attackable(self.map.tile_data(u.tile_pos),
+                               u.tile_pos,
+                               target_tile,
+                               pos):
+            raise ValueError("{} can't attack {}".format(u.type, pos))
+
+        # Mark that the unit has attacked.
+        u.turn_state[1] = True
+
+        # Face the attackee
+        u.face_vector((pos[0] - u.tile_x, pos[1] - u.tile_y))
+
+        # Calculate the damage, with some random variance, and deal it
+        damage = combat.roll_damage(u.get_damage(target, target_tile),
+                                    generator)
+        target.hurt(damage)
+
+        # If the unit was destroyed, check if there are any others left on
+        # a team other than the attacker's
+        destroyed = not target.active
+        if destroyed and all(other.team == u.team for other in self.units):
+            self.win_team = u.team
+
+        return AttackResult(target, damage, destroyed)
+
+    def turn_blocker(self):
+        """
+        Returns a unit on the current team which is stopping the turn from
+        ending, or None if the turn can end.
+        """
+        for u in self.units:
+            if u.team == self.cur_team and not u.can_turn_end():
+                return u
+
+        return None
+
+    def end_turn(self):
+        """
+        Ends the current team's turn and advances to the next one. Returns
+        a list of the units which were destroyed as the turn ended, such as
+        aircraft which ran out of fuel.
+        """
+        blocker = self.turn_blocker()
+        if blocker:
+            raise ValueError("{} at {} must move before the turn ends".format(
+                blocker.type, blocker.tile_pos))
+
+        # Call the turn end function of each of the current team's units
+        destroyed = []
+        for u in list(self.units):
+            if u.team == self.cur_team and not u.turn_ended():
+                destroyed.append(u)
+
+        # advance turn
+        self.current_turn += 1
+        return destroyed
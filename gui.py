@@ -1,12 +1,13 @@
 import sys, pygame
-import random
 
 from pygame.sprite import LayeredUpdates
 from collections import namedtuple
 
-import tiles, unit, animation
+import tiles, unit, animation, cache, level, combat, effects, game_state
 from unit import *
-from effects.explosion import Explosion
+from effects.pool import EffectPool
+from unit_images import UnitImages
+from minimap import Minimap
 from sounds import SoundManager
 import analyze
 
@@ -25,15 +26,36 @@ pygame.font.init()
 FONT_SIZE = 16
 BIG_FONT_SIZE = 42
 FONT = pygame.font.SysFont("Arial", FONT_SIZE)
+BOLD_FONT = pygame.font.SysFont("Arial", FONT_SIZE)
+BOLD_FONT.set_bold(True)
 BIG_FONT = pygame.font.SysFont("Arial", BIG_FONT_SIZE)
 BIG_FONT.set_bold(True)
 
+# Number of rendered text surfaces to keep around
+TEXT_CACHE_SIZE = 256
+
+# How many units are created each frame while a level loads
+UNITS_PER_FRAME = 500
+
+# Size of the loading screen's progress bar
+LOAD_BAR_WIDTH = 300
+LOAD_BAR_HEIGHT = 20
+
 # padding for left and top side of the bar
 PAD = 6
 
 # Speed of reticle blinking
 RETICLE_RATE = 0.02
 
+# How many pixels the map scrolls each frame while a scroll key is held
+SCROLL_SPEED = 10
+
+# The available zoom levels, from closest to furthest
+ZOOM_LEVELS = (1, 0.5, 0.25)
+
+# Number of scaled unit and effect images to keep for the current zoom
+ZOOM_CACHE_SIZE = 1024
+
 # RGBA colors for grid stuff
 SELECT_COLOR = (255, 255, 0, 255)
 UNMOVED_COLOR = (0, 0, 0, 255)
@@ -55,6 +77,12 @@ TEAM_NAME = {
     1: "red"
 }
 
+# Colours for each team's units on the minimap
+TEAM_COLOR = {
+    0: (0, 255, 0),
+    1: (255, 0, 0)
+}
+
 # Possible GUI modes
 # http://stackoverflow.com/questions/702834/whats-the-common-practice-
 # for-enums-in-python
@@ -86,7 +114,7 @@ class GUI(LayeredUpdates):
         if not self.sel_unit: return False
         
         # If the unit is done its move, we also can't.
-        return not self.sel_unit.turn_state[0]
+        return self.state.can_move(self.sel_unit)
     
     def can_attack(self):
         """
@@ -96,7 +124,7 @@ class GUI(LayeredUpdates):
         if not self.sel_unit: return False
         
         # If the unit is done its attack, we also can't.
-        return not self.sel_unit.turn_state[1]
+        return self.state.can_attack(self.sel_unit)
     
     def move_pressed(self):
         """
@@ -107,34 +135,11 @@ class GUI(LayeredUpdates):
             self.change_mode(Modes.Select)
             return
         
-        # If there is no unit selected, nothing happens.
-        if not self.sel_unit: return
-        # If the unit has already moved nothing happens.
-        elif self.sel_unit.turn_state[0] == True: return
+        # If the unit can't move nothing happens.
+        if not self.can_move(): return
         
         # Determine where we can move.
-        pos = (self.sel_unit.tile_x, self.sel_unit.tile_y)
-        
-        # These will be used in pathfinding
-        cost = lambda c: (
-            self.sel_unit.move_cost(self.map.tile_data(c)))
-        passable = lambda c: (
-            self.sel_unit.is_passable(self.map.tile_data(c), c))
-        
-        reachable = tiles.reachable_tiles(
-            self.map,
-            pos,
-            self.sel_unit.speed,
-            cost,
-            passable)
-        
-        # Check that the tiles can actually be stopped in
-        for t_pos in reachable:
-            tile = self.map.tile_data(t_pos)
-            
-            # This can be stopped in, so add it
-            if self.sel_unit.is_stoppable(tile, t_pos):
-                self._movable_tiles.add(t_pos)
+        self._movable_tiles = self.state.move_options(self.sel_unit)
         
         # Highlight those squares
         self.map.set_highlight(
@@ -152,29 +157,14 @@ class GUI(LayeredUpdates):
             self.change_mode(Modes.Select)
             return
         
-        # If there is no unit selected, nothing happens.
-        if not self.sel_unit: return
-        # If the unit has already attacked, nothing happens.
-        elif self.sel_unit.turn_state[1] == True: return
-        
-        # Get information about the unit and its location.
-        unit_pos = (self.sel_unit.tile_x, self.sel_unit.tile_y)
-        unit_tile = self.map.tile_data(unit_pos)
-        
-        # These are all the positions in range of the unit's attack.
-        in_range = self.sel_unit.positions_in_range(unit_tile, unit_pos)
-        
-        # Determine which tiles the unit can actually attack.
-        for check_pos in in_range:
-            check_tile = self.map.tile_data(check_pos)
-            if self.sel_unit.is_attackable(
-                unit_tile,
-                unit_pos,
-                check_tile,
-                check_pos):
-                self._attackable_tiles.add(check_pos)
-        
-        # Highlight the attackable tiles
+        # If the unit can't attack, nothing happens.
+        if not self.can_attack(): return
+        
+        # Determine which tiles are in range and which can be attacked
+        in_range, self._attackable_tiles = self.state.attack_options(
+            self.sel_unit)
+        
+        # Highlight the tiles in range
         self.map.set_highlight(
             "attack", ATK_COLOR_A, ATK_COLOR_B, in_range)
             
@@ -189,33 +179,24 @@ class GUI(LayeredUpdates):
         This is called when the end turn button is pressed.
         Advances to the next turn.
         """
-        # Check if the turn can actually end
-        for unit in base_unit.BaseUnit.active_units:
-            if unit.team == self.cur_team and not unit.can_turn_end():
-                
-                # Make sure the game mode is changed back to Select
-                self.change_mode(Modes.Select)
-                
-                # If not, switch to that unit
-                self.sel_unit = unit
-                return
-        
-        # reset game mode
+        # Make sure the game mode is changed back to Select
         self.change_mode(Modes.Select)
         
+        # Check if the turn can actually end. If not, switch to the unit
+        # which is stopping it.
+        blocker = self.state.turn_blocker()
+        if blocker:
+            self.sel_unit = blocker
+            return
+        
         # unselect unit
         self.sel_unit = None
         
-        # Reset the turn states of all units
-        for unit in base_unit.BaseUnit.active_units:
-            # This is the current team's unit, so call its turn end function
-            if unit.team == self.cur_team and not unit.turn_ended():
-                    # The unit died! Add its death effect
-                    if unit.die_effect:
-                        self._effects.add(unit.die_effect(unit.rect.topleft))
-        
-        # advance turn
-        self.current_turn += 1
+        # Advance the turn, removing any units which died as it ended
+        for dead_unit in self.state.end_turn():
+            self._unit_rects.pop(dead_unit, None)
+            self.minimap.remove_unit(dead_unit)
+            self.add_effect(dead_unit.die_effect, dead_unit.tile_pos)
 
     def __init__(self, screen_rect, bg_color):
         """
@@ -247,10 +228,8 @@ class GUI(LayeredUpdates):
         self.bg_color = bg_color
         self.map = None
 
-        # Set up team information
-        self.num_teams = None
-        self.current_turn = 0
-        self.win_team = None 
+        # The game being played, which keeps track of the teams and turns
+        self.state = None
 
         # The currently selected unit
         self.sel_unit = None
@@ -274,22 +253,55 @@ class GUI(LayeredUpdates):
                                              20,
                                              RETICLE_RATE)
         
-        # This will store effects which are drawn over everything else
+        # This will store effects which are drawn over everything else,
+        # and the tile each one is shown over
         self._effects = pygame.sprite.Group()
+        self._effect_tiles = {}
+        
+        # Finished effects are recycled through this
+        self.effect_pool = EffectPool()
+        
+        # The base damage of each unit type against each other
+        self.damage_table = combat.DamageTable(unit.unit_types,
+                                               tiles.tile_types)
+        
+        # The tile positions units were last drawn at with their screen
+        # rects, and the screen position of the map at that time
+        self._unit_rects = {}
+        self._units_origin = None
+        
+        # Unit and effect images scaled to the current zoom level
+        self._zoom_index = 0
+        self._zoomed_images = cache.LRUCache(ZOOM_CACHE_SIZE)
+        
+        # The overview of the map
+        self.minimap = None
+        self.show_minimap = False
+        
+        # Creates the level's units while it's loading, and how far along
+        # it is as (units loaded, total units or None if not yet known)
+        self._unit_loader = None
+        self._load_progress = None
+        self.loading_progress = (0, 0)
+        
+        # The info bar is only redrawn when what it shows changes
+        self._bar_image = pygame.Surface(self.bar_rect.size)
+        self._bar_key = None
+        self._text_cache = cache.LRUCache(TEXT_CACHE_SIZE)
     
     @property
     def cur_team(self):
         """
-        Gets the current team based on the turn.
+        Gets the team whose turn it is.
         """
-        return (self.current_turn) % self.num_teams
+        return self.state.cur_team
     
     @property
     def cur_day(self):
         """
-        Gets the current day based on the turn.
+        Gets the current day.
         """
-        return (self.current_turn) // self.num_teams + 1
+        return self.state.cur_day
         
     def change_mode(self, new_mode):
         """
@@ -312,115 +324,163 @@ class GUI(LayeredUpdates):
             
         self.mode = new_mode
         
-    def load_level(self, filename):
+    def load_level(self, filename, progress = None):
         """
-        Loads a map from the given filename.
+        Loads a map from the given filename. The units are created a batch
+        at a time over the following frames, while a loading screen is
+        shown; call finish_loading to create them all at once instead.
+        progress, if given, is called as progress(loaded, total) after each
+        batch of units. total is None while a level is read from its source
+        for the first time, since its units are read as they're created.
         """
         self.remove(self.map)
         
-        map_file = open(filename, 'r')
-        
-        # Move up to the line with the team count
-        line = map_file.readline()
-        while line.find("Teams: ") < 0:
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected team count")
-        
-        # Get the number of teams
-        line = line.lstrip("Teams: ")
-        self.num_teams = int(line)
-        
-        # Move up to the line with the tile sprites
-        line = map_file.readline()
-        while line.find("Tiles: ") < 0:
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected tile file")
-        
-        # Get the number of teams
-        line = line.lstrip("Tiles: ")
-        line = line.strip()
-        tile_filename = line
-        
-        # Move up to the line with the tile size
-        line = map_file.readline()
-        while line.find("Tile size: ") < 0:
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected tile size")
-        
-        # Get the number of teams
-        line = line.lstrip("Tile size: ")
-        line = line.strip()
-        size = line.split('x')
-        tile_w, tile_h = size
-        
-        # Convert to ints
-        tile_w = int(tile_w)
-        tile_h = int(tile_h)
-        
-        # Move up to the line with the map file
-        line = map_file.readline()
-        while line.find("Map: ") < 0:
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected map filename")
-        
-        # Get the map filename
-        line = line.lstrip("Map: ")
-        line = line.strip()
-        map_filename = line
-        
-        # Create the tile map
-        self.map = tiles.TileMap(tile_filename,
-                                  tile_w,
-                                  tile_h)
-        self.map.load_from_file(map_filename)
+        # Read the level, reusing the compiled copy if it's up to date
+        lvl = level.load_level(filename)
+        
+        # Create the tile map, and start a game on it
+        self.map = tiles.TileMap(lvl.tile_sheet,
+                                  lvl.tile_width,
+                                  lvl.tile_height)
+        self.map.load_from_file(lvl.map_filename)
         self.add(self.map)
+        self.state = game_state.GameState(self.map, lvl.num_teams)
+        self.sel_unit = None
+        self.mode = Modes.Select
+        self._bar_key = None
+        self._unit_rects.clear()
+        self._zoom_index = 0
+        self._zoomed_images.clear()
+        
+        # Show the map in the view, centred if it fits
+        self.map.set_view(self.view_rect)
         
-        # Center the map on-screen
-        self.map.rect.center = self.view_rect.center
-        
-        # Move up to the unit definitions
-        while line.find("UNITS START") < 0:
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected unit definitions")
-        line = map_file.readline()
-        
-        # Create the units
-        while line.find("UNITS END") < 0:
-            line = line.rstrip()
-            line = line.split(' ')
-            unit_name = line[0]
-            unit_team = int(line[1])
-            unit_x, unit_y = int(line[2]), int(line[3])
-            unit_angle = int(line[4])
+        # Keep everything drawn from the terrain up to date when it changes
+        self.map.add_terrain_listener(self.on_terrain_changed)
+        
+        # Set up the minimap, showing it if the map doesn't fit on-screen
+        self.minimap = Minimap(self.map, TEAM_COLOR)
+        pixel_w, pixel_h = self.map.get_pixel_size()
+        self.show_minimap = (pixel_w > self.view_rect.w or
+                             pixel_h > self.view_rect.h)
+        
+        # Start creating the units
+        self._load_progress = progress
+        self.loading_progress = (0, level.unit_count(lvl))
+        self._unit_loader = self._load_units(lvl.units)
+        
+    def _load_units(self, records):
+        """
+        Creates the units in the given records, yielding after each batch
+        of UNITS_PER_FRAME units. Each batch's units are checked before any
+        of them are created.
+        """
+        loaded, total = self.loading_progress
+        
+        for batch in level.batch_units(records, UNITS_PER_FRAME):
+            game_state.check_unit_names(batch)
+            for record in batch:
+                new_unit = self.state.add_unit(record)
+                
+                # Show it on the minimap
+                self.minimap.place_unit(new_unit)
             
-            if not unit_name in unit.unit_types:
-                raise Exception("No unit of name {} found!".format(unit_name))
-            new_unit = unit.unit_types[unit_name](team = unit_team,
-                                                  tile_x = unit_x,
-                                                  tile_y = unit_y,
-                                                  activate = True,
-                                                  angle = unit_angle)
+            loaded += len(batch)
+            self.loading_progress = (loaded, total)
+            if self._load_progress:
+                self._load_progress(loaded, total)
+            yield
+        
+    @property
+    def loading(self):
+        """
+        Whether the level's units are still being created.
+        """
+        return self._unit_loader is not None
+        
+    def load_next_batch(self):
+        """
+        Creates the next batch of units in the level being loaded.
+        """
+        if next(self._unit_loader, StopIteration) is StopIteration:
+            self._unit_loader = None
+            
+    def finish_loading(self):
+        """
+        Creates all of the remaining units in the level being loaded.
+        """
+        while self.loading:
+            self.load_next_batch()
+        
+    def on_terrain_changed(self, coords, old_id, new_id):
+        """
+        This is called when a tile on the map changes type.
+        """
+        self.minimap.update_tile(coords)
+        
+        # The tile info in the bar may be out of date
+        self._bar_key = None
+        
+        # Moves and attacks were worked out for the old terrain, so have
+        # the player choose again
+        if self.mode in (Modes.ChooseMove, Modes.ChooseAttack):
+            self.change_mode(Modes.Select)
+        
+    def on_key(self, e):
+        """
+        This is called when a key is pressed.
+        e is the key event.
+        """
+        if not self.map or self.loading: return
+        
+        # Zoom in and out
+        if e.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            self.set_zoom_index(self._zoom_index - 1)
+        elif e.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.set_zoom_index(self._zoom_index + 1)
             
-            # Add the unit to the update group and set its display rect
-            self.update_unit_rect(new_unit)
+        # Toggle the minimap
+        elif e.key == pygame.K_m:
+            self.show_minimap = not self.show_minimap
             
-            line = map_file.readline()
-            if line == "":
-                raise Exception ("Expected end of unit definitions")
+    def set_zoom_index(self, index):
+        """
+        Switches to the given entry of ZOOM_LEVELS. Scaled images from the
+        old zoom level are thrown away.
+        """
+        if not 0 <= index < len(ZOOM_LEVELS) or index == self._zoom_index:
+            return
+        
+        self._zoom_index = index
+        self.map.set_zoom(ZOOM_LEVELS[index])
+        
+        # Everything has to be rescaled and moved
+        self._zoomed_images.clear()
+        self._unit_rects.clear()
+        
+    def zoomed(self, image):
+        """
+        Returns the given unit or effect image scaled to the current zoom
+        level. Scaled images are cached until the zoom level changes.
+        """
+        if self.map.zoom == 1:
+            return image
+        
+        return self._zoomed_images.get_or_create(
+            image,
+            lambda: pygame.transform.smoothscale(
+                image, self.map.get_tile_size()))
         
     def on_click(self, e):
         """
         This is called when a click event occurs.
         e is the click event.
         """
-        # Don't react when in move, attack or game over mode.
+        # Don't react when in move, attack or game over mode, or while
+        # the level is loading.
         if (self.mode == Modes.Moving or
-            self.mode == Modes.GameOver):
+            self.mode == Modes.GameOver or
+            self.loading):
             return
         
         # make sure we have focus and that it was the left mouse button
@@ -477,6 +537,19 @@ class GUI(LayeredUpdates):
                         # Play the button sound
                         SoundManager.play(BUTTON_SOUND)
                         
+    def add_effect(self, name, tile_pos):
+        """
+        Shows the effect with the given name over a tile. Does nothing if
+        name is None. The effect stays over that tile if the map is scrolled
+        or zoomed while it plays.
+        """
+        if name:
+            effect = self.effect_pool.acquire(
+                effects.effect_types[name],
+                self.map.screen_coords(tile_pos))
+            self._effects.add(effect)
+            self._effect_tiles[effect] = tile_pos
+        
     def sel_unit_attack(self, pos):
         """
         Attack the given position using the selected unit.
@@ -484,55 +557,30 @@ class GUI(LayeredUpdates):
         # Change the game state to show that there was an attack.
         self.change_mode(Modes.Select)
         
-        # Mark that the unit has attacked.
-        self.sel_unit.turn_state[1] = True
-        
-        # Face the attackee
-        self.sel_unit.face_vector((
-            pos[0] - self.sel_unit.tile_x,
-            pos[1] - self.sel_unit.tile_y))
-        
-        # Get info about the attackee
-        atk_unit = unit.base_unit.BaseUnit.get_unit_at_pos(pos)
-        atk_tile = self.map.tile_data(pos)
-        
-        # Calculate the damage
-        damage = self.sel_unit.get_damage(atk_unit, atk_tile)
-        
-        damage += random.choice([-1, -1, 0, 0, 0, 0, 0, 1, 1, 2])
-
-        damage = max(damage, 0)
-
         # Deal damage
-        atk_unit.hurt(damage)
+        result = self.state.attack(self.sel_unit, pos)
         
         # Do the attack effect.
-        if self.sel_unit.hit_effect:
-            self._effects.add(self.sel_unit.hit_effect(
-                self.map.screen_coords(pos)))
+        self.add_effect(self.sel_unit.hit_effect, pos)
                 
         # Play the unit's attack sound
         if self.sel_unit.hit_sound:
             SoundManager.play(self.sel_unit.hit_sound)
         
-        if not atk_unit.active:
+        if result.destroyed:
+            # It won't be drawn again
+            self._unit_rects.pop(result.target, None)
+            self.minimap.remove_unit(result.target)
+            
             # Add its death effect
-            if self.sel_unit.kill_effect:
-                self._effects.add(self.sel_unit.kill_effect(
-                    self.map.screen_coords(pos)))
+            self.add_effect(self.sel_unit.kill_effect, pos)
             
             # Play its death sound
-            if atk_unit.die_sound:
-                SoundManager.play(atk_unit.die_sound)
-
-            # If the unit was destroyed, check if there are any others
-            # left on a team other than the selected unit
-            for u in unit.base_unit.BaseUnit.active_units:
-                if u.team != self.sel_unit.team:
-                    return
+            if result.target.die_sound:
+                SoundManager.play(result.target.die_sound)
                 
-            # No other units, so game over!
-            self.win_team = self.sel_unit.team
+        # If that was the last enemy, game over!
+        if self.state.game_over:
             self.mode = Modes.GameOver
     
     def sel_unit_move(self, pos):
@@ -543,33 +591,13 @@ class GUI(LayeredUpdates):
         self.change_mode(Modes.Moving)
         
         # Implements animation for movement of unit if it exists (teleport unit spawns a warp)
-        if self.sel_unit.move_animation:
-            self._effects.add(self.sel_unit.move_animation(self.map.screen_coords(pos)))
-
-        # Mark that the unit has moved
-        self.sel_unit.turn_state[0] = True
-        
-        #the tile position the unit is at
-        from_tile_pos = (self.sel_unit.tile_x,
-                         self.sel_unit.tile_y)
+        self.add_effect(self.sel_unit.move_animation, pos)
         
         # Play the unit's movement sound
         SoundManager.play(self.sel_unit.move_sound)
         
-        # These will be used in pathfinding
-        cost = lambda c: (
-            self.sel_unit.move_cost(self.map.tile_data(c)))
-        passable = lambda c: (
-            self.sel_unit.is_passable(self.map.tile_data(c), c))
-        
-        #set the path in the unit.
-        self.sel_unit.set_path(
-            tiles.find_path(
-                self.map,
-                from_tile_pos,
-                pos,
-                cost,
-                passable))
+        # Set the unit moving along its path
+        self.state.move(self.sel_unit, pos, animate = True)
                 
     def get_unit_at_screen_pos(self, pos):
         """
@@ -578,36 +606,55 @@ class GUI(LayeredUpdates):
         """
         # Get the unit's tile position.
         tile_pos = self.map.tile_coords(pos)
-        return unit.base_unit.BaseUnit.get_unit_at_pos(tile_pos)
+        return self.state.unit_at(tile_pos)
         
-    def update_unit_rect(self, unit):
+    def unit_rect(self, unit):
         """
-        Scales a unit's display rectangle to screen coordiantes.
+        Returns a unit's display rectangle in screen coordinates.
         """
-        x, y = unit.tile_x, unit.tile_y
-        screen_x, screen_y = self.map.screen_coords((x, y))
-        unit.rect.x = screen_x
-        unit.rect.y = screen_y
+        return pygame.Rect(self.map.screen_coords(unit.tile_pos),
+                           self.map.get_tile_size())
         
     def update(self):
         """
         Update everything in the group.
         """
+        # Nothing happens until the level has loaded
+        if self.loading:
+            self.load_next_batch()
+            if self.loading: return
+        
         LayeredUpdates.update(self)
         
-        # Update units
-        base_unit.BaseUnit.active_units.update()
+        # Move units along their paths
+        if self.state:
+            self.state.units.update()
+        
+        # Scroll the map with the arrow keys
+        if self.map:
+            keys = pygame.key.get_pressed()
+            dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+            dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+            if dx or dy:
+                self.map.scroll(dx * SCROLL_SPEED, dy * SCROLL_SPEED)
         
         # The unit is finished moving, so go back to select
         if self.mode == Modes.Moving:
+            # Only the moving unit needs to move on the minimap
+            if self.sel_unit:
+                self.minimap.place_unit(self.sel_unit)
+                
             if (not self.sel_unit) or (not self.sel_unit.is_moving):
                 self.change_mode(Modes.Select)
                 
         # Update the reticle effect
         self._reticle.update()
         
-        # Update effects
+        # Update effects, forgetting the tiles of those which finished
         self._effects.update()
+        if len(self._effect_tiles) != len(self._effects):
+            self._effect_tiles = {e: self._effect_tiles[e]
+                                  for e in self._effects}
 
     def draw(self):
         """
@@ -616,28 +663,67 @@ class GUI(LayeredUpdates):
         # Fill in the background
         self.screen.fill(self.bg_color)
         
+        if self.loading:
+            self.draw_loading_screen()
+            pygame.display.flip()
+            return
+        
+        # Keep everything on the map inside the view
+        self.screen.set_clip(self.view_rect)
+        
         # Update and draw the group contents
         LayeredUpdates.draw(self, self.screen)
         
-        # draw units
-        for u in base_unit.BaseUnit.active_units:
-            self.update_unit_rect(u)
-        base_unit.BaseUnit.active_units.draw(self.screen)
+        # Only tiles in view (and units partly in view) need to be drawn
+        if self.map:
+            visible = self.map.visible_tiles().inflate(2, 2)
+        else:
+            visible = pygame.Rect(0, 0, 0, 0)
+        
+        # Every unit rect has to move if the map has scrolled
+        if self.map and self.map.camera.origin != self._units_origin:
+            self._units_origin = self.map.camera.origin
+            self._unit_rects.clear()
+        
+        # draw units, in layer order, in one batch
+        unit_blits = []
+        for u in (self.state.units if self.state else ()):
+            if visible.collidepoint(u.tile_x, u.tile_y):
+                # Only units which have moved need their rect updated
+                pos = u.tile_pos
+                drawn = self._unit_rects.get(u)
+                if not drawn or drawn[0] != pos:
+                    drawn = self._unit_rects[u] = (pos, self.unit_rect(u))
+                unit_blits.append((self.zoomed(UnitImages.get(u)), drawn[1]))
+        self.screen.blits(unit_blits, False)
         
         # If there's a selected unit, outline it
         if self.sel_unit:
             pygame.gfxdraw.rectangle(
                 self.screen,
-                self.sel_unit.rect,
+                self.unit_rect(self.sel_unit),
                 SELECT_COLOR)
                 
-        # Mark potential targets
-        for tile_pos in self._attackable_tiles:
-            screen_pos = self.map.screen_coords(tile_pos)
-            self.draw_reticle(screen_pos)
-            
-        # Draw effects
-        self._effects.draw(self.screen)
+        # Mark potential targets and draw effects in one batch
+        reticle = self.zoomed(self._reticle.image)
+        overlay_blits = [(reticle, self.map.screen_coords(tile_pos))
+                         for tile_pos in self._attackable_tiles
+                         if visible.collidepoint(tile_pos)]
+        overlay_blits.extend(
+            (self.zoomed(e.image), self.map.screen_coords(tile_pos))
+            for e, tile_pos in self._effect_tiles.items())
+        self.screen.blits(overlay_blits, False)
+        
+        self.screen.set_clip(None)
+        
+        # Draw the minimap in the bottom-left corner of the view
+        if self.minimap and self.show_minimap:
+            minimap_h = self.minimap.get_size()[1]
+            self.minimap.draw(
+                self.screen,
+                (self.view_rect.x + PAD,
+                 self.view_rect.bottom - minimap_h - PAD),
+                self.map.visible_tiles())
         
         # Draw the status bar
         self.draw_bar()
@@ -646,13 +732,10 @@ class GUI(LayeredUpdates):
         if self.mode == Modes.GameOver:
             # Determine the message
             win_text = "TEAM {} WINS!".format(
-                TEAM_NAME[self.win_team].upper())
+                TEAM_NAME[self.state.win_team].upper())
             
             # Render the text
-            win_msg = BIG_FONT.render(
-                win_text,
-                True,
-                FONT_COLOR)
+            win_msg = self.render_text(win_text, BIG_FONT)
                 
             # Move it into position
             msg_rect = pygame.Rect((0, 0), win_msg.get_size())
@@ -664,36 +747,118 @@ class GUI(LayeredUpdates):
         # Update the screen
         pygame.display.flip()
         
-    def draw_reticle(self, pos):
+    def draw_loading_screen(self):
+        """
+        Draws how many of the level's units have been created so far.
+        """
+        loaded, total = self.loading_progress
+        
+        # The panel in the middle of the screen
+        panel = pygame.Rect(0, 0, LOAD_BAR_WIDTH + PAD * 2,
+                            FONT_SIZE + LOAD_BAR_HEIGHT + PAD * 3)
+        panel.center = self.screen_rect.center
+        pygame.draw.rect(self.screen, BAR_COLOR, panel)
+        pygame.draw.rect(self.screen, OUTLINE_COLOR, panel, 2)
+        
+        # The progress text. The total isn't known while the level's units
+        # are still being read.
+        if total is None:
+            text = "Loading units: {}".format(loaded)
+        else:
+            text = "Loading units: {} / {}".format(loaded, total)
+        self.screen.blit(self.render_text(text), (panel.x + PAD, panel.y + PAD))
+        
+        # The progress bar
+        bar = pygame.Rect(panel.x + PAD,
+                          panel.y + FONT_SIZE + PAD * 2,
+                          LOAD_BAR_WIDTH,
+                          LOAD_BAR_HEIGHT)
+        fill = bar.copy()
+        fill.w = LOAD_BAR_WIDTH * loaded // total if total else 0
+        pygame.draw.rect(self.screen, BUTTON_DISABLED_COLOR, bar)
+        pygame.draw.rect(self.screen, BUTTON_HIGHLIGHT_COLOR, fill)
+        pygame.draw.rect(self.screen, OUTLINE_COLOR, bar, 1)
+        
+    def render_text(self, text, font = FONT):
+        """
+        Returns a surface with the given text rendered in the given font.
+        Surfaces are cached, so the same text is only rendered once.
+        """
+        return self._text_cache.get_or_create(
+            (text, font),
+            lambda: font.render(text, True, FONT_COLOR))
+
+    def unit_bar_state(self, u):
         """
-        Draws a reticle with its top-left corner at pos.
+        Returns a tuple of everything about a unit that the info bar shows,
+        or None if there is no unit.
         """
-        self.screen.blit(self._reticle.image, pos)
+        if not u: return None
+        
+        fuel = None
+        if isinstance(u, unit.air_unit.AirUnit):
+            fuel = (u.fuel, u.max_fuel)
+        
+        return (u,
+                u.team,
+                u.health,
+                u.speed,
+                u.get_atk_range(),
+                u.damage,
+                u.defense,
+                fuel,
+                tuple(u.turn_state))
 
     def draw_bar(self):
         """
-        Draws the info bar on the right side of the screen. This 
-        function is unavoidably quite large, as each panel needs to be
-        handled with separate logic.
+        Draws the info bar on the right side of the screen. The contents
+        are only re-rendered when the selected unit, the hovered tile, the
+        hovered unit or the turn changes.
         """
         if not self.map: return
         
-        line_num = 0
-        
         #Determine where the mouse is
         mouse_pos = pygame.mouse.get_pos()
-        coords = self.map.tile_coords(mouse_pos)
+        coords = None
+        if self.map.rect.collidepoint(mouse_pos):
+            coords = self.map.tile_coords(mouse_pos)
+        
+        #Get the hovered tile and unit
+        tile = coords and self.map.tile_data(coords)
+        hov_unit = self.state.unit_at(coords)
+        
+        #Redraw the bar if anything on it has changed
+        bar_key = (self.state.current_turn,
+                   self.unit_bar_state(self.sel_unit),
+                   coords,
+                   self.unit_bar_state(hov_unit))
+        if bar_key != self._bar_key:
+            self._bar_key = bar_key
+            self.render_bar(coords, tile, hov_unit)
+        
+        self.screen.blit(self._bar_image, self.bar_rect)
+
+        for button in self.buttons:
+            self.draw_bar_button(button)
+
+    def render_bar(self, coords, tile, hov_unit):
+        """
+        Renders the info bar contents onto the bar image. This 
+        function is unavoidably quite large, as each panel needs to be
+        handled with separate logic.
+        """
+        line_num = 0
         
         #draw the background of the bar
-        barRect = self.bar_rect
-        pygame.draw.rect(self.screen, BAR_COLOR, barRect)
+        barRect = self._bar_image.get_rect()
+        pygame.draw.rect(self._bar_image, BAR_COLOR, barRect)
         
         #draw the outline of the bar
-        outlineRect = self.bar_rect.copy()
+        outlineRect = barRect.copy()
         outlineRect.w -= 1
         outlineRect.h -= 1
-        pygame.draw.rect(self.screen, OUTLINE_COLOR, outlineRect, 2)
-        
+        pygame.draw.rect(self._bar_image, OUTLINE_COLOR, outlineRect, 2)
+
         #Title for turn info
         self.draw_bar_title("DAY {}".format(self.cur_day), line_num)
         line_num += 1
@@ -709,9 +874,6 @@ class GUI(LayeredUpdates):
         self.draw_bar_div_line(line_num)
         line_num += 1
         
-        #Get the tile data
-        tile = self.map.tile_data(coords)
-
         if self.sel_unit:
             #title for tile section
             self.draw_bar_title("SELECTED UNIT", line_num)
@@ -802,9 +964,6 @@ class GUI(LayeredUpdates):
             self.draw_bar_div_line(line_num)
             line_num += 1
             
-        #Get the hovered unit
-        hov_unit = unit.base_unit.BaseUnit.get_unit_at_pos(coords)
-        
         if hov_unit:
             #title for tile section
             self.draw_bar_title("HOVERED UNIT", line_num)
@@ -854,41 +1013,47 @@ class GUI(LayeredUpdates):
             if self.sel_unit and hov_unit.team != self.sel_unit.team:
 
                 
-                if self.sel_unit.can_hit(hov_unit):
-                    #how much damage can we do?
-                    pot_dmg = self.sel_unit.get_damage(hov_unit, tile)
+                #how much damage can we do?
+                pot_dmg = self.damage_table.unit_damage(
+                    self.sel_unit, hov_unit, self.map.get_tile_id(coords))
+                
+                if pot_dmg != combat.CANNOT_HIT:
 
-                    FONT.set_bold(True)
                     self.draw_bar_text("Damage Range: {}-{}".format(
-                            max(pot_dmg-1,0),pot_dmg+2), line_num)
+                            *combat.damage_range(pot_dmg)), line_num, BOLD_FONT)
                     line_num += 1
-                    FONT.set_bold(False)
 
                     #analyze the probability of destroying hov_unit
                     #using up to 30 attackes
-                    probs = analyze.destroy_prob(self.sel_unit, hov_unit,
-                                                 tile, 30)
+                    summary = analyze.forecast_summary(pot_dmg,
+                                                       hov_unit.health, 31)
+                    probs = summary.curve
 
-                    #find the first (noticeably) nonzero probability
-                    min_nonzero = 0
-                    while min_nonzero < 26 and probs[min_nonzero] < 0.00005:
-                        min_nonzero += 1
+                    #the first (noticeably) nonzero probability, and the
+                    #first which is essentially 1
+                    first, last = summary.first_turns
+                    if first is None:
+                        first = 26
+                    if last is None:
+                        last = len(probs) - 1
 
-                    #display up to 4 entries, quitting if the probability
-                    #is essentially 1
                     self.draw_bar_div_line(line_num)
                     line_num += 1
-                    for i in range(min_nonzero, min_nonzero+4):
+                    if summary.expected is not None:
+                        self.draw_bar_text("Expected: {:.1f} turn(s)".format(
+                                summary.expected), line_num)
+                        line_num += 1
+
+                    #display up to 4 entries, stopping once the probability
+                    #is essentially 1
+                    for i in range(first, min(first + 4, last + 1)):
                         self.draw_bar_text("{} turn(s): {:.2f}%".format(
                                 i, probs[i]*100), line_num)
                         line_num += 1
-                        if probs[i] >= 0.99995: break
 
                 else:
-                    FONT.set_bold(True)
-                    self.draw_bar_text("Cannot Target", line_num)
+                    self.draw_bar_text("Cannot Target", line_num, BOLD_FONT)
                     line_num += 1
-                    FONT.set_bold(False)
 
 #                self.draw_bar_text("Potential Damage: {}".format(pot_dmg),
 #                                    line_num)
@@ -898,26 +1063,23 @@ class GUI(LayeredUpdates):
             self.draw_bar_div_line(line_num)
             line_num += 1
 
-        for button in self.buttons:
-            self.draw_bar_button(button)
-
-    def draw_bar_text(self, text, line_num):
+    def draw_bar_text(self, text, line_num, font = FONT):
         """
         Draws text with a specified variable at a specifed line number.
         """
-        line_text = FONT.render(text, True, FONT_COLOR)
-        self.screen.blit(
+        line_text = self.render_text(text, font)
+        self._bar_image.blit(
             line_text,
-            (self.bar_rect.x + PAD, FONT_SIZE * line_num + PAD))
+            (PAD, FONT_SIZE * line_num + PAD))
 
     def draw_bar_title(self, text, line_num):
         """
         Draws a title at a specified line number with the specified text.
         """
-        title_text = FONT.render(text, True, FONT_COLOR)
-        self.screen.blit(
+        title_text = self.render_text(text)
+        self._bar_image.blit(
             title_text,
-            (self.bar_rect.centerx - (title_text.get_width()/2),
+            (self.bar_rect.w/2 - (title_text.get_width()/2),
             FONT_SIZE * line_num + PAD))
 
     def draw_bar_div_line(self, line_num):
@@ -926,10 +1088,10 @@ class GUI(LayeredUpdates):
         """
         y = FONT_SIZE * line_num + FONT_SIZE//2 + PAD
         pygame.draw.line(
-            self.screen,
+            self._bar_image,
             (50, 50, 50),
-            (self.bar_rect.x, y),
-            (self.bar_rect.right, y))
+            (0, y),
+            (self.bar_rect.w, y))
             
     def get_button_rect(self, button):
         """
@@ -975,7 +1137,7 @@ class GUI(LayeredUpdates):
         pygame.draw.rect(self.screen, OUTLINE_COLOR, but_out_rect, 2)
 
         # Draw the text
-        but_text = FONT.render(button.text, True, FONT_COLOR)
+        but_text = self.render_text(button.text)
         self.screen.blit(
             but_text,
             (self.bar_rect.centerx - (but_text.get_width()/2),
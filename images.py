@@ -0,0 +1,47 @@
+import pygame
+
+class ImageManager:
+    """
+    A class to manage images. Each image file is only loaded from disk once,
+    and sprite sheets are only sliced into frames once.
+    """
+    _images = {}
+    _frames = {}
+
+    @staticmethod
+    def load(filename):
+        """
+        Returns the image loaded from the given file, loading it first if
+        it hasn't been loaded yet.
+
+        >>> ImageManager.load("assets/tiles.png") is ImageManager.load(
+        ...     "assets/tiles.png")
+        True
+        """
+        if filename not in ImageManager._images:
+            ImageManager._images[filename] = pygame.image.load(filename)
+
+        return ImageManager._images[filename]
+
+    @staticmethod
+    def frames(filename, frame_w, frame_h):
+        """
+        Returns a tuple of frames sliced left to right from the sprite sheet
+        in the given file. Each frame is frame_w x frame_h.
+
+        >>> frames = ImageManager.frames("assets/explosion.png", 20, 20)
+        >>> len(frames)
+        5
+        >>> frames[0].get_size()
+        (20, 20)
+        """
+        key = (filename, frame_w, frame_h)
+
+        if key not in ImageManager._frames:
+            sheet = ImageManager.load(filename)
+            count = sheet.get_width() // frame_w
+            ImageManager._frames[key] = tuple(
+                sheet.subsurface(pygame.Rect(i * frame_w, 0, frame_w, frame_h))
+                for i in range(count))
+
+        return ImageManager._frames[key]
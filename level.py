@@ -0,0 +1,364 @@
+import os, struct, hashlib, itertools
+from collections import namedtuple
+
+# A unit placed on the map when a level starts
+UnitRecord = namedtuple('UnitRecord', ['name', 'team', 'x', 'y', 'angle'])
+
+# Everything needed to set up a level. Loaded levels are shared, so the
+# units are kept in a tuple, except in a level being read from its source
+# for the first time, whose units are an iterator reading them from the file.
+Level = namedtuple('Level', ['num_teams',
+                             'tile_sheet',
+                             'tile_width',
+                             'tile_height',
+                             'map_filename',
+                             'units'])
+
+# Compiled levels are saved next to their source with this extension
+COMPILED_EXTENSION = ".lvlc"
+
+# Compiled levels start with this, followed by the rest of the header: the
+# source file's modification time, size and SHA-1 hash, the team count,
+# the tile size, and the number of unit names and units. Then come the
+# tile sheet and map filenames and the unit names, each prefixed with its
+# length, followed by the packed unit table.
+LVLC_MAGIC = b"LVLC"
+LVLC_VERSION = 1
+_LVLC_HEADER = struct.Struct("<4sHqq20sHHHHI")
+_LVLC_STRING = struct.Struct("<H")
+
+# Each unit is an index into the unit names, a team, a position and angle
+_LVLC_UNIT = struct.Struct("<HBiih")
+
+# Levels already loaded in this process, by filename, with the source's
+# modification time and size when they were loaded
+_loaded = {}
+
+def _field(line, prefix):
+    """
+    Returns the text after the given prefix on a line. Unlike lstrip, this
+    only removes the prefix itself.
+
+    >>> _field("Map: maps/demo.gif\\n", "Map: ")
+    'maps/demo.gif'
+    >>> _field("Teams: 2", "Teams: ")
+    '2'
+    """
+    return line[line.find(prefix) + len(prefix):].strip()
+
+def parse_level(filename):
+    """
+    Reads a level from a text .lvl file.
+
+    >>> level = parse_level("maps/demo.lvl")
+    >>> level.num_teams, level.tile_sheet, level.map_filename
+    (1, 'assets/tiles.png', 'maps/demo.gif')
+    >>> level.tile_width, level.tile_height
+    (20, 20)
+    >>> level.units[0]
+    UnitRecord(name='SuperJeep', team=0, x=1, y=1, angle=0)
+    >>> len(level.units)
+    18
+    """
+    level = stream_level(filename)
+    return level._replace(units = tuple(level.units))
+
+def stream_level(filename):
+    """
+    Reads a level from a text .lvl file a line at a time. The returned
+    level's units are an iterator which reads each unit record from the
+    file as it's needed, so units can be created before the whole file has
+    been read. The file is closed once they've all been read.
+
+    >>> level = stream_level("maps/demo.lvl")
+    >>> level.map_filename, next(level.units)
+    ('maps/demo.gif', UnitRecord(name='SuperJeep', team=0, x=1, y=1, angle=0))
+    >>> len(list(level.units))
+    17
+    """
+    map_file = open(filename, 'r')
+    try:
+        level = _read_header(map_file)
+    except Exception:
+        map_file.close()
+        raise
+
+    def units():
+        with map_file:
+            yield from read_units(map_file)
+
+    return level._replace(units = units())
+
+def _read_header(lines):
+    """
+    Reads everything but the units of a level from an iterator over the
+    lines of a .lvl file, leaving it just after UNITS START. The returned
+    level has no units.
+    """
+    def find_line(text, error):
+        """
+        Returns the next line containing the given text.
+        """
+        for line in lines:
+            if line.find(text) >= 0:
+                return line
+        raise Exception(error)
+
+    num_teams = int(_field(
+        find_line("Teams: ", "Expected team count"), "Teams: "))
+    tile_sheet = _field(
+        find_line("Tiles: ", "Expected tile file"), "Tiles: ")
+
+    size = _field(find_line("Tile size: ", "Expected tile size"),
+                  "Tile size: ")
+    tile_w, tile_h = size.split('x')
+
+    map_filename = _field(
+        find_line("Map: ", "Expected map filename"), "Map: ")
+
+    find_line("UNITS START", "Expected unit definitions")
+
+    return Level(num_teams, tile_sheet, int(tile_w), int(tile_h),
+                 map_filename, None)
+
+def read_units(lines):
+    """
+    Yields a UnitRecord for each unit definition in lines, stopping at
+    UNITS END. lines can be any iterable, such as an open file positioned
+    after UNITS START, so records are parsed as they're needed.
+
+    >>> list(read_units(["Tank 1 3 4 90\\n", "UNITS END\\n"]))
+    [UnitRecord(name='Tank', team=1, x=3, y=4, angle=90)]
+    """
+    for line in lines:
+        if line.find("UNITS END") >= 0:
+            return
+
+        name, team, x, y, angle = line.rstrip().split(' ')
+        yield UnitRecord(name, int(team), int(x), int(y), int(angle))
+
+    raise Exception("Expected end of unit definitions")
+
+def batch_units(units, batch_size):
+    """
+    Yields lists of at most batch_size unit records, in the order they're
+    given. units can be any iterable, and is only read a batch at a time.
+
+    The records aren't grouped by unit type. Creating a unit doesn't set up
+    any sprites: each type's sprite sheet is loaded once, the first time a
+    unit of that type is drawn, and units which look the same share one
+    image (see unit_images.UnitImages). Grouping would also mean reading
+    every record before creating any units, and would change the drawing
+    order of units on the same layer.
+
+    >>> units = parse_level("maps/demo.lvl").units
+    >>> batches = list(batch_units(units, 5))
+    >>> [len(b) for b in batches]
+    [5, 5, 5, 3]
+    >>> [u for batch in batches for u in batch] == list(units)
+    True
+    """
+    records = iter(units)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def compiled_filename(filename):
+    """
+    Returns the filename of the compiled copy of the given level.
+
+    >>> compiled_filename("maps/demo.lvl")
+    'maps/demo.lvlc'
+    """
+    return os.path.splitext(filename)[0] + COMPILED_EXTENSION
+
+def _pack_string(text):
+    """
+    Returns a string encoded and prefixed with its length.
+    """
+    data = text.encode("utf-8")
+    return _LVLC_STRING.pack(len(data)) + data
+
+def _unpack_string(data, offset):
+    """
+    Reads a length-prefixed string from data at offset, returning the
+    string and the offset after it.
+    """
+    length, = _LVLC_STRING.unpack_from(data, offset)
+    offset += _LVLC_STRING.size
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+def save_compiled(level, filename, source_stat, source_hash):
+    """
+    Writes a level to a compiled file, recording the stat result and hash of
+    the source it was read from.
+    """
+    names = sorted(set(u.name for u in level.units))
+    name_index = {name: i for i, name in enumerate(names)}
+
+    parts = [
+        _LVLC_HEADER.pack(LVLC_MAGIC,
+                          LVLC_VERSION,
+                          source_stat.st_mtime_ns,
+                          source_stat.st_size,
+                          source_hash,
+                          level.num_teams,
+                          level.tile_width,
+                          level.tile_height,
+                          len(names),
+                          len(level.units)),
+        _pack_string(level.tile_sheet),
+        _pack_string(level.map_filename)]
+    parts.extend(_pack_string(name) for name in names)
+    parts.extend(_LVLC_UNIT.pack(name_index[u.name], u.team, u.x, u.y, u.angle)
+                 for u in level.units)
+
+    with open(filename, 'wb') as f:
+        f.write(b"".join(parts))
+
+def read_compiled(filename):
+    """
+    Reads a compiled level. Returns the level, along with the modification
+    time, size and hash of the source it was compiled from.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if len(data) < _LVLC_HEADER.size:
+        raise ValueError("Compiled level {} is truncated".format(filename))
+
+    (magic, version, mtime_ns, size, source_hash, num_teams,
+     tile_w, tile_h, name_count, unit_count) = _LVLC_HEADER.unpack_from(data)
+    if magic != LVLC_MAGIC or version != LVLC_VERSION:
+        raise ValueError("{} is not a compiled level".format(filename))
+
+    offset = _LVLC_HEADER.size
+    tile_sheet, offset = _unpack_string(data, offset)
+    map_filename, offset = _unpack_string(data, offset)
+
+    names = []
+    for _ in range(name_count):
+        name, offset = _unpack_string(data, offset)
+        names.append(name)
+
+    table = data[offset:offset + unit_count * _LVLC_UNIT.size]
+    if len(table) != unit_count * _LVLC_UNIT.size:
+        raise ValueError("Compiled level {} is truncated".format(filename))
+
+    units = tuple(UnitRecord(names[name], team, x, y, angle)
+                  for name, team, x, y, angle in _LVLC_UNIT.iter_unpack(table))
+
+    level = Level(num_teams, tile_sheet, tile_w, tile_h, map_filename, units)
+    return level, mtime_ns, size, source_hash
+
+def load_level(filename):
+    """
+    Returns the level in the given .lvl file. Levels already loaded are
+    reused while their source is unchanged. Otherwise the compiled copy is
+    used if the source's modification time and size match it, or failing
+    that if its contents hash the same. If there is no usable compiled copy
+    the source is read as for stream_level, and compiled and kept once all
+    of its units have been read.
+
+    >>> import shutil, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "demo.lvl")
+    >>> _ = shutil.copy("maps/demo.lvl", path)
+    >>> level = load_level(path)
+    >>> os.path.exists(compiled_filename(path))
+    False
+    >>> tuple(level.units) == parse_level("maps/demo.lvl").units
+    True
+    >>> os.path.exists(compiled_filename(path))
+    True
+    >>> load_level(path) == parse_level("maps/demo.lvl")
+    True
+    >>> _loaded.clear()
+    >>> load_level(path) == parse_level("maps/demo.lvl")
+    True
+
+    Levels which can't be compiled are still loaded.
+
+    >>> text = open(path).read().replace("Jeep 0 ", "Jeep -1 ", 1)
+    >>> _ = open(path, 'w').write(text)
+    >>> _loaded.clear()
+    >>> next(load_level(path).units).team
+    -1
+    """
+    stat = os.stat(filename)
+
+    # Reuse the level if it's already been loaded
+    loaded = _loaded.get(filename)
+    if loaded and loaded[:2] == (stat.st_mtime_ns, stat.st_size):
+        return loaded[2]
+
+    compiled = compiled_filename(filename)
+    level = None
+    try:
+        level, mtime_ns, size, source_hash = read_compiled(compiled)
+    except (OSError, ValueError):
+        pass
+
+    if level and (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+        # The source was touched, so check whether it really changed
+        if source_hash == _hash_file(filename):
+            _try_save_compiled(level, compiled, stat, source_hash)
+        else:
+            level = None
+
+    if not level:
+        level = stream_level(filename)
+        return level._replace(
+            units = _keep_when_read(filename, compiled, stat, level))
+
+    _loaded[filename] = (stat.st_mtime_ns, stat.st_size, level)
+    return level
+
+def _keep_when_read(filename, compiled, source_stat, level):
+    """
+    Yields the unit records of a level being read from its source. Once
+    they've all been read, the level is compiled and kept for reuse; that
+    needs every record, so they're collected as they go by.
+    """
+    units = []
+    for record in level.units:
+        units.append(record)
+        yield record
+
+    level = level._replace(units = tuple(units))
+    _try_save_compiled(level, compiled, source_stat, _hash_file(filename))
+    _loaded[filename] = (source_stat.st_mtime_ns, source_stat.st_size, level)
+
+def unit_count(level):
+    """
+    Returns the number of units in a level, or None if they're still being
+    read from its source.
+
+    >>> unit_count(parse_level("maps/demo.lvl"))
+    18
+    >>> print(unit_count(stream_level("maps/demo.lvl")))
+    None
+    """
+    if isinstance(level.units, tuple):
+        return len(level.units)
+    return None
+
+def _hash_file(filename):
+    """
+    Returns the SHA-1 hash of a file's contents.
+    """
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+def _try_save_compiled(level, filename, source_stat, source_hash):
+    """
+    Saves a compiled level, doing nothing if the file can't be written so
+    that levels can still be loaded from read-only directories, or if the
+    level has values which don't fit the compiled format, such as a team
+    number below 0 or above 255.
+    """
+    try:
+        save_compiled(level, filename, source_stat, source_hash)
+    except (OSError, struct.error):
+        pass
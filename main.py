@@ -36,6 +36,9 @@ while 1:
         (event.key == pygame.K_q or event.key == pygame.K_ESCAPE)):
             pygame.display.quit()
             sys.exit()
+        # Respond to other keys
+        elif event.type == pygame.KEYDOWN:
+            main_gui.on_key(event)
         # Respond to clicks
         elif event.type == pygame.MOUSEBUTTONUP:
             main_gui.on_click(event)
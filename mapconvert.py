@@ -0,0 +1,32 @@
+"""
+Converts indexed image maps into binary maps, which load much faster.
+
+Usage: python mapconvert.py MAP_IMAGE [OUTPUT] [--tiles SHEET] [--tile-size WxH]
+"""
+import argparse, os
+import tiles
+
+def main():
+    parser = argparse.ArgumentParser(
+        description = "Converts an indexed image map into a binary map.")
+    parser.add_argument("image", help = "the map image to convert")
+    parser.add_argument("output", nargs = "?",
+                        help = "the binary map to write (default: the "
+                               "image's name with a .tmap extension)")
+    parser.add_argument("--tiles", default = "assets/tiles.png",
+                        help = "the tile sheet the map uses")
+    parser.add_argument("--tile-size", default = "20x20",
+                        help = "the size of each tile, as WxH")
+    args = parser.parse_args()
+    
+    try:
+        tile_w, tile_h = (int(n) for n in args.tile_size.split("x"))
+    except ValueError:
+        parser.error("Tile size should look like 20x20")
+    
+    output = args.output or os.path.splitext(args.image)[0] + ".tmap"
+    tiles.convert_map(args.image, output, args.tiles, tile_w, tile_h)
+    print("Wrote {}".format(output))
+    
+if __name__ == "__main__":
+    main()
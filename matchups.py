@@ -0,0 +1,99 @@
+"""
+Writes a balance report of every unit type against every other on each type
+of tile: the base damage, the expected number of attacks to destroy the
+defender from full health, and the chance of destroying it within each of
+the first few attacks. Runs without opening a display.
+
+Usage: python matchups.py [--turns N] [--format csv|json] [--output FILE]
+"""
+import argparse, csv, json, sys
+import numpy
+import terrain, unit, analyze, combat
+from unit import *
+
+# Attacks to look ahead when working out the expected number of attacks
+EXPECTED_HORIZON = 200
+
+def matchup_rows(turns):
+    """
+    Returns a list of dictionaries, one for each attacker type, defender
+    type and tile type. Matchups where the attacker can't hit have no
+    damage or probabilities.
+    
+    >>> rows = matchup_rows(2)
+    >>> row = [r for r in rows if (r["attacker"], r["defender"], r["tile"]) ==
+    ...        ("Tank", "Jeep", "plains")][0]
+    >>> row["base_damage"], row["expected_attacks"], row["kill_prob_2"]
+    (6, 2.95, 0.05)
+    >>> matchup_rows(EXPECTED_HORIZON + 1)[0]["kill_prob_201"]
+    1.0
+    """
+    table = combat.DamageTable(unit.unit_types, terrain.tile_types)
+    damage = table.array
+    tile_ids = sorted(terrain.tile_types)
+    
+    # Every matchup's damage and the defender's health, as arrays indexed
+    # by (attacker, defender, tile)
+    damage = damage[:, :, tile_ids]
+    hps = numpy.broadcast_to(table.max_health[None, :, None], damage.shape)
+    can_hit = damage != combat.CANNOT_HIT
+    
+    curves = analyze.kill_curves(numpy.maximum(damage, 0), hps,
+                                 max(EXPECTED_HORIZON, turns))
+    
+    # The expected number of attacks is the sum of the chances of still
+    # being alive after each attack. It's only known if the defender is
+    # certain to be destroyed within the horizon.
+    expected = (1 - curves[..., :-1]).sum(axis = -1)
+    converged = curves[..., -1] > 1 - 1e-9
+    
+    rows = []
+    for a, d, t in numpy.ndindex(damage.shape):
+        row = {"attacker": table.names[a],
+               "defender": table.names[d],
+               "tile": terrain.tile_types[tile_ids[t]].type,
+               "base_damage": None,
+               "expected_attacks": None}
+        row.update(("kill_prob_{}".format(k), None)
+                   for k in range(1, turns + 1))
+        
+        if can_hit[a, d, t]:
+            row["base_damage"] = int(damage[a, d, t])
+            if converged[a, d, t]:
+                row["expected_attacks"] = round(float(expected[a, d, t]), 4)
+            for k in range(1, turns + 1):
+                row["kill_prob_{}".format(k)] = round(
+                    float(curves[a, d, t, k]), 4)
+        
+        rows.append(row)
+    
+    return rows
+    
+def main():
+    parser = argparse.ArgumentParser(
+        description = "Writes a balance report of every unit matchup.")
+    parser.add_argument("--turns", type = int, default = 3,
+                        help = "how many attacks to give kill chances for")
+    parser.add_argument("--format", choices = ("csv", "json"),
+                        default = "csv", help = "the output format")
+    parser.add_argument("--output", help = "the file to write to "
+                                           "(default: standard output)")
+    args = parser.parse_args()
+    
+    rows = matchup_rows(args.turns)
+    
+    out = open(args.output, "w", newline = "") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(rows, out, indent = 1)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames = list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if args.output:
+            out.close()
+    
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import pygame
+import numpy
+import tiles
+
+# The longest side of the minimap on screen, in pixels
+MINIMAP_SIZE = 150
+
+# Colour of the rectangle showing what's in the view
+VIEW_COLOR = (255, 255, 255)
+
+class Minimap:
+    """
+    An overview of the whole map. Large maps are sampled every few tiles,
+    so there are no more pixels than fit on screen, and only the sampled
+    rows of the map are read. The terrain is drawn in one go, and after
+    that only tiles and units which change are redrawn.
+    
+    >>> t = tiles.TileMap("assets/tiles.png", 20, 20)
+    >>> t.load_from_file("maps/test-1.gif")
+    >>> m = Minimap(t, {0: (255, 0, 0)})
+    >>> m.image.get_size()
+    (5, 5)
+    >>> m.image.get_at((2, 0))[:3] == t.get_tile_color(2)
+    True
+    >>> t.load_grid([[0] * 400] * 10)
+    >>> Minimap(t, {}).image.get_size()
+    (134, 4)
+    """
+    
+    def __init__(self, tile_map, team_colors):
+        """
+        tile_map: the TileMap to show
+        team_colors: a dictionary of team numbers to unit dot colours
+        """
+        self._map = tile_map
+        self._team_colors = team_colors
+        
+        # The colour of each tile type, indexed by tile ID
+        self._palette = numpy.zeros((256, 3), dtype = numpy.uint8)
+        for tile_id in tiles.tile_types:
+            self._palette[tile_id] = tile_map.get_tile_color(tile_id)
+        
+        # The units on each pixel, and the pixel each unit is drawn on
+        self._occupants = {}
+        self._unit_tiles = {}
+        
+        # Each pixel shows the tile at its top-left, one in every step tiles
+        # along each side
+        w, h = tile_map.get_map_size()
+        self._map_size = (w, h)
+        self._step = max(1, -(-max(w, h) // MINIMAP_SIZE))
+        
+        # Draw all of the terrain at once
+        grid = tile_map.get_tile_grid()[::self._step, ::self._step]
+        self.image = pygame.Surface((grid.shape[1], grid.shape[0]))
+        pygame.surfarray.blit_array(self.image, self._palette[grid.T])
+        
+        # The minimap scaled to its on-screen size
+        scale = MINIMAP_SIZE / max(w, h)
+        self._scaled_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        self._scaled = None
+        
+    def get_size(self):
+        """
+        Returns the on-screen size of the minimap.
+        """
+        return self._scaled_size
+        
+    def _pixel(self, coords):
+        """
+        Returns the pixel which shows the given tile.
+        """
+        return (coords[0] // self._step, coords[1] // self._step)
+        
+    def _redraw_pixel(self, pixel):
+        """
+        Redraws a single pixel, showing the top unit on it if there is one.
+        """
+        occupants = self._occupants.get(pixel)
+        if occupants:
+            color = self._team_colors.get(occupants[-1].team, VIEW_COLOR)
+        else:
+            color = self._palette[self._map.get_tile_id(
+                (pixel[0] * self._step, pixel[1] * self._step))]
+            
+        self.image.set_at(pixel, color)
+        self._scaled = None
+        
+    def update_tile(self, coords):
+        """
+        Redraws the given tile after its terrain has changed.
+        """
+        self._redraw_pixel(self._pixel(coords))
+        
+    def place_unit(self, u):
+        """
+        Draws a unit at its current tile, removing it from its old one.
+        """
+        coords = self._pixel((round(u.tile_x), round(u.tile_y)))
+        old_coords = self._unit_tiles.get(u)
+        if coords == old_coords:
+            return
+            
+        self.remove_unit(u)
+        self._unit_tiles[u] = coords
+        self._occupants.setdefault(coords, []).append(u)
+        self._redraw_pixel(coords)
+        
+    def remove_unit(self, u):
+        """
+        Removes a unit from the minimap.
+        """
+        coords = self._unit_tiles.pop(u, None)
+        if coords is None:
+            return
+            
+        self._occupants[coords].remove(u)
+        if not self._occupants[coords]:
+            del self._occupants[coords]
+        self._redraw_pixel(coords)
+        
+    def draw(self, surface, pos, view_tiles):
+        """
+        Draws the minimap onto a surface with its top-left corner at pos.
+        view_tiles is the rectangle of tiles in view, which is outlined.
+        """
+        # Only rescale when something has changed
+        if not self._scaled:
+            self._scaled = pygame.transform.scale(self.image, self._scaled_size)
+        
+        rect = surface.blit(self._scaled, pos)
+        
+        # Outline the part of the map that's in view
+        w, h = self._map_size
+        scale_x = rect.w / w
+        scale_y = rect.h / h
+        view_rect = pygame.Rect(rect.x + view_tiles.x * scale_x,
+                                rect.y + view_tiles.y * scale_y,
+                                view_tiles.w * scale_x,
+                                view_tiles.h * scale_y).clip(rect)
+        pygame.draw.rect(surface, VIEW_COLOR, view_rect, 1)
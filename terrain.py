@@ -0,0 +1,1004 @@
+"""
+The terrain and the rules for moving across it: tile types, the grid of
+tiles making up a map, and pathfinding. Nothing here draws anything, so it
+can be used without pygame; tiles.TileMap adds rendering on top.
+"""
+import os, struct
+import numpy
+import pqueue, helper
+from collections import namedtuple
+
+# A container class which stores information about a tile.
+Tile = namedtuple('Tile', ['type',
+                           'sprite_id',
+                           'passable',
+                           'defense_bonus',
+                           'range_bonus'])
+
+# The tile data of many tiles at once, with one array per field
+TileColumns = namedtuple('TileColumns', ['ids',
+                                         'exists',
+                                         'passable',
+                                         'defense_bonus',
+                                         'range_bonus'])
+
+# a dictionary of tile IDs associated with their type data
+tile_types = {
+    0:  Tile('plains', 0, True, 0, 0),
+    1:  Tile('wall', 1, False, 0, 0),
+    2:  Tile('water', 2, False, 0, 0),
+    3:  Tile('sand', 3, True, 0, 0),
+    4:  Tile('road', 4, True, 0, 0),
+    5:  Tile('mountain', 5, False, 1, 2),
+    6:  Tile('forest', 6, True, 2, 0)
+}
+
+def _tile_column(field, dtype):
+    """
+    Returns an array of one field of the tile data, indexed by tile ID, so
+    that many tiles can be looked up at once.
+    
+    >>> _tile_column('defense_bonus', numpy.int8)[[0, 5, 6]].tolist()
+    [0, 1, 2]
+    """
+    column = numpy.zeros(256, dtype = dtype)
+    for tile_id, tile in tile_types.items():
+        column[tile_id] = getattr(tile, field)
+    return column
+
+# Each field of the tile data, indexed by tile ID
+_sprite_ids = _tile_column('sprite_id', numpy.uint8)
+_passable = _tile_column('passable', bool)
+_defense_bonus = _tile_column('defense_bonus', numpy.int8)
+_range_bonus = _tile_column('range_bonus', numpy.int8)
+
+# The tile data of every tile ID, or None for unused IDs
+_tile_table = tuple(tile_types.get(tile_id) for tile_id in range(256))
+
+# Whether each byte value is a tile type, for checking whole maps at once
+_valid_ids = numpy.array([tile is not None for tile in _tile_table])
+
+# Binary maps start with this, followed by the rest of the header: the map
+# width and height in tiles, the tile width and height in pixels, and the
+# length of the tile sheet's filename. Then comes the filename, and then
+# one byte per tile in row order.
+TMAP_MAGIC = b"TMAP"
+_TMAP_HEADER = struct.Struct("<4sIIHHH")
+
+# GIF maps start with one of these, followed by the rest of the screen
+# descriptor: the width and height, the palette flags, the background colour
+# index and the aspect ratio. Each image in the file starts with a separator
+# and its own descriptor: its position and size, and its palette flags.
+GIF_MAGICS = (b"GIF87a", b"GIF89a")
+_GIF_SCREEN = struct.Struct("<6sHHBBB")
+_GIF_IMAGE = struct.Struct("<HHHHB")
+_GIF_IMAGE_SEPARATOR = 0x2C
+_GIF_EXTENSION = 0x21
+
+# The most codes a GIF's LZW compression can have
+_GIF_MAX_CODES = 4096
+
+# The most tiles of a binary map checked at once when it's loaded
+_CHECK_BLOCK_SIZE = 1 << 20
+
+# The header of a binary map
+MapHeader = namedtuple('MapHeader', ['width',
+                                     'height',
+                                     'tile_width',
+                                     'tile_height',
+                                     'sheet_name',
+                                     'data_offset'])
+
+def is_binary_map(filename):
+    """
+    Returns whether the given file is a binary map rather than an image.
+    
+    >>> is_binary_map("maps/test-1.gif")
+    False
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(TMAP_MAGIC)) == TMAP_MAGIC
+        
+def is_gif_map(filename):
+    """
+    Returns whether the given file is a GIF, which can be read without
+    pygame.
+    
+    >>> is_gif_map("maps/test-1.gif"), is_gif_map("assets/tiles.png")
+    (True, False)
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(GIF_MAGICS[0])) in GIF_MAGICS
+        
+def _skip_gif_blocks(data, pos):
+    """
+    Returns the position after the data sub-blocks starting at pos.
+    """
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+    
+def _lzw_decode(data, min_code_size):
+    """
+    Decompresses GIF image data, returning the colour index of each pixel.
+    
+    >>> list(_lzw_decode(bytes([0x8c, 0x0b]), 2))
+    [1, 1, 1]
+    """
+    clear = 1 << min_code_size
+    end = clear + 1
+    base_table = [bytes([i]) for i in range(clear)] + [b"", b""]
+    
+    table = list(base_table)
+    code_size = min_code_size + 1
+    prev = None
+    out = bytearray()
+    
+    # Codes are packed least significant bit first
+    buffer = bits = 0
+    for byte in data:
+        buffer |= byte << bits
+        bits += 8
+        
+        while bits >= code_size:
+            code = buffer & ((1 << code_size) - 1)
+            buffer >>= code_size
+            bits -= code_size
+            
+            if code == clear:
+                table = list(base_table)
+                code_size = min_code_size + 1
+                prev = None
+                continue
+            if code == end:
+                return out
+            
+            if code < len(table):
+                entry = table[code]
+                if prev is not None and len(table) < _GIF_MAX_CODES:
+                    table.append(prev + entry[:1])
+            elif prev is not None and code == len(table):
+                # The code being defined by this very step
+                entry = prev + prev[:1]
+                table.append(entry)
+            else:
+                raise ValueError("GIF has an invalid code")
+                
+            out += entry
+            prev = entry
+            if len(table) == 1 << code_size and code_size < 12:
+                code_size += 1
+                
+    return out
+    
+def read_gif_map(filename):
+    """
+    Reads the tiles of a GIF map into a (height, width) array of tile IDs,
+    without needing pygame. The tile number of each pixel is its colour
+    index. Only the first image in the file is read.
+    
+    >>> read_gif_map("maps/test-1.gif")[1].tolist()
+    [5, 6, 0, 0, 0]
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+        
+    try:
+        magic, width, height, flags, background, _ = (
+            _GIF_SCREEN.unpack_from(data))
+        if magic not in GIF_MAGICS:
+            raise ValueError("Map {} is not a GIF".format(filename))
+        
+        # Skip the palette; the colours don't matter, only their indices
+        pos = _GIF_SCREEN.size
+        if flags & 0x80:
+            pos += 3 << ((flags & 0x07) + 1)
+        
+        # Skip any extensions before the first image
+        while data[pos] == _GIF_EXTENSION:
+            pos = _skip_gif_blocks(data, pos + 2)
+        if data[pos] != _GIF_IMAGE_SEPARATOR:
+            raise ValueError("Map {} has no image".format(filename))
+        
+        left, top, image_w, image_h, image_flags = (
+            _GIF_IMAGE.unpack_from(data, pos + 1))
+        pos += 1 + _GIF_IMAGE.size
+        if image_flags & 0x80:
+            pos += 3 << ((image_flags & 0x07) + 1)
+        
+        # Gather the image data from its sub-blocks and decompress it
+        min_code_size = data[pos]
+        start = pos = pos + 1
+        chunks = []
+        while data[pos]:
+            chunks.append(data[pos + 1:pos + 1 + data[pos]])
+            pos += data[pos] + 1
+        pixels = _lzw_decode(b"".join(chunks), min_code_size)
+    except (IndexError, struct.error):
+        raise ValueError("Map {} is truncated".format(filename))
+        
+    if len(pixels) < image_w * image_h:
+        raise ValueError("Map {} is truncated".format(filename))
+    image = numpy.frombuffer(pixels, dtype = numpy.uint8,
+                             count = image_w * image_h)
+    image = image.reshape(image_h, image_w)
+    
+    # Interlaced images store every 8th row, then the 4th rows between
+    # those, then the 2nd rows, then the rest
+    if image_flags & 0x40:
+        rows = numpy.concatenate([numpy.arange(first, image_h, step)
+                                  for first, step in ((0, 8), (4, 8),
+                                                      (2, 4), (1, 2))])
+        interlaced, image = image, numpy.empty_like(image)
+        image[rows] = interlaced
+    
+    # Anything the image doesn't cover is the background colour
+    tiles = numpy.full((height, width), background, dtype = numpy.uint8)
+    tiles[top:top + image_h, left:left + image_w] = (
+        image[:height - top, :width - left])
+    
+    check_tile_types(tiles, "Map {}".format(filename))
+    return tiles
+    
+def read_map_header(filename):
+    """
+    Reads the header of a binary map, returning a MapHeader.
+    """
+    with open(filename, "rb") as f:
+        data = f.read(_TMAP_HEADER.size)
+        if len(data) < _TMAP_HEADER.size:
+            raise ValueError("Map {} is truncated".format(filename))
+        
+        magic, width, height, tile_w, tile_h, name_len = (
+            _TMAP_HEADER.unpack(data))
+        if magic != TMAP_MAGIC:
+            raise ValueError("Map {} is not a binary map".format(filename))
+        
+        sheet_name = f.read(name_len).decode("utf-8")
+        
+    return MapHeader(width, height, tile_w, tile_h, sheet_name,
+                     _TMAP_HEADER.size + name_len)
+    
+def check_tile_types(tiles, name):
+    """
+    Raises a ValueError if any of the given tile IDs isn't a tile type.
+    name describes where the tiles came from, for the error message.
+    
+    >>> check_tile_types(numpy.array([0, 6, 7, 7]), "Map x")
+    Traceback (most recent call last):
+    ...
+    ValueError: Map x has unknown tile types [7]
+    >>> check_tile_types(numpy.array([0, -1, 300]), "Map y")
+    Traceback (most recent call last):
+    ...
+    ValueError: Map y has unknown tile types [-1, 300]
+    >>> check_tile_types(numpy.zeros((4, 4), dtype = numpy.uint8), "Map z")
+    """
+    tiles = numpy.asarray(tiles)
+    if tiles.dtype != numpy.uint8 and tiles.size:
+        valid = tiles.min() >= 0 and tiles.max() < len(_valid_ids)
+    else:
+        valid = True
+    
+    # Only look for which types are unknown if there are any
+    if valid and _valid_ids[tiles].all():
+        return
+    
+    unknown = numpy.setdiff1d(tiles, list(tile_types))
+    raise ValueError("{} has unknown tile types {}".format(
+        name, unknown.tolist()))
+    
+class TerrainMap:
+    """
+    A grid of tile IDs and the terrain rules that go with it, with no
+    graphics. Maps can be loaded from binary map files or GIFs, or set from
+    rows of tile IDs. Other image maps need pygame to read, so they're
+    loaded with tiles.TileMap or converted with mapconvert.py first.
+    
+    >>> t = TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0, 4, 4], [2, 6, 0]])
+    >>> t.get_map_size(), t.tile_data((1, 1)).type
+    ((3, 2), 'forest')
+    """
+    
+    def __init__(self, sheet_name, tile_width, tile_height):
+        """
+        sheet_name: the filename of the sprite sheet the map is drawn with
+        tile_width: the width of each tile, in pixels
+        tile_height: the height of each tile, in pixels
+        """
+        self._sheet_name = sheet_name
+        self._base_tile_size = (tile_width, tile_height)
+        self._map_width = None
+        self._map_height = None
+        
+        # The tile IDs in row order, one byte each, and a (height, width)
+        # array which shares its memory. For binary maps the bytes are
+        # mapped from the file, so only the parts which are used get read.
+        self._tiles = bytearray()
+        self._tile_grid = None
+        
+        # Counts changes to the terrain, and the functions told about them
+        self.terrain_version = 0
+        self._terrain_listeners = []
+        
+    def _tile_count(self):
+        """
+        Returns the number of tiles on the map.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t._tile_count()
+        25
+        """
+        return self._map_width * self._map_height
+        
+    def _tile_position(self, index):
+        """
+        Returns a tile's coordinates in tile units within the map given its
+        index in the list.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t._tile_position(12)
+        (2, 2)
+        """
+        return (index % self._map_width, index // self._map_width)
+        
+    def _tile_exists(self, coords):
+        """
+        Returns true if a tile exists, or false if it doesn't
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t._tile_exists((2, 2))
+        True
+        >>> t._tile_exists((-2, -1))
+        False
+        >>> t._tile_exists((6, 7))
+        False
+        """
+        return not (
+            coords[0] < 0 or
+            coords[0] >= self._map_width or
+            coords[1] < 0 or
+            coords[1] >= self._map_height)
+        
+    def _tile_index(self, coords):
+        """
+        Returns a tile's index in the list given its tile coordinates in tile
+        units. Returns -1 if the provided coordinates are invalid.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t._tile_index((2, 2))
+        12
+        """
+        if not self._tile_exists(coords): return -1
+
+        #make sure to cast to int because input is sometimes floats
+        #There won't be rounding errors though because the numbers
+        #are just integers with .0 after
+        return int(coords[1]) * self._map_width + int(coords[0])
+        
+    def _set_tiles(self, tiles):
+        """
+        Sets the tiles from any sequence of tile IDs in row order, or a
+        contiguous uint8 array. A memoryview is used as is rather than
+        copied, so memory-mapped tiles stay mapped.
+        """
+        if isinstance(tiles, memoryview):
+            self._tiles = tiles
+        else:
+            self._tiles = bytearray(tiles)
+        self._tile_grid = numpy.frombuffer(
+            self._tiles, dtype = numpy.uint8).reshape(
+                self._map_height, self._map_width)
+        
+    def _invalidate_tile(self, coords):
+        """
+        Called when the tile at the given coordinates changes. Maps which
+        draw the terrain override this to redraw it.
+        """
+        pass
+        
+    def get_tiles(self):
+        """
+        Returns a copy of the tiles as a list. Use get_tile_grid or
+        get_tile_buffer to read the tiles without copying them.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.get_tiles() == [0, 1, 2, 3, 4, 5, 6, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+        ...                   0, 0, 0, 0, 0, 0, 0, 0]
+        True
+        """
+        return list(self._tiles)
+        
+    def get_tile_grid(self):
+        """
+        Returns a read-only (height, width) array of the tile IDs. It shares
+        memory with the map, so it isn't copied.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> grid = t.get_tile_grid()
+        >>> grid.shape
+        (5, 5)
+        >>> grid[1].tolist()
+        [5, 6, 0, 0, 0]
+        >>> grid.flags.writeable
+        False
+        """
+        grid = self._tile_grid.view()
+        grid.flags.writeable = False
+        return grid
+        
+    def get_tile_buffer(self):
+        """
+        Returns a read-only memoryview of the tile IDs in row order, one
+        byte per tile.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> buf = t.get_tile_buffer()
+        >>> len(buf), buf[4], buf.readonly
+        (25, 4, True)
+        """
+        return memoryview(self._tiles).toreadonly()
+            
+    def load_from_file(self, filename):
+        """
+        Loads tile data from the given binary map or GIF. A binary map's
+        tiles are memory-mapped rather than read in full.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> t.get_map_size(), t.get_tile_id((1, 1))
+        ((5, 5), 6)
+        >>> t.load_from_file("assets/tiles.png")
+        Traceback (most recent call last):
+        ...
+        ValueError: Map assets/tiles.png is not a binary map
+        """
+        if is_gif_map(filename):
+            self._set_tiles(self._load_gif(filename))
+        else:
+            self._set_tiles(self._load_binary(filename))
+        
+    def load_grid(self, rows):
+        """
+        Sets the map from rows of tile IDs, all the same length.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1], [9, 0]])
+        Traceback (most recent call last):
+        ...
+        ValueError: Map grid has unknown tile types [9]
+        """
+        tiles = numpy.array(rows, dtype = numpy.intp, ndmin = 2)
+        check_tile_types(tiles, "Map grid")
+        
+        self._map_height, self._map_width = tiles.shape
+        self._set_tiles(tiles.astype(numpy.uint8).ravel())
+        
+    def _load_gif(self, filename):
+        """
+        Reads the map size and tiles from a GIF map.
+        """
+        tiles = read_gif_map(filename)
+        self._map_height, self._map_width = tiles.shape
+        return tiles.ravel()
+        
+    def _load_binary(self, filename):
+        """
+        Reads the map size from a binary map's header and maps its tiles
+        into memory. The map must use this map's tile sheet and tile size.
+        Every tile type is checked as the map is loaded, a block of tiles
+        at a time, so a bad tile is reported here rather than wherever it's
+        first used.
+        
+        >>> import os, tempfile
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1], [2, 3]])
+        >>> path = os.path.join(tempfile.mkdtemp(), "bad.tmap")
+        >>> t.save_binary(path)
+        >>> with open(path, "r+b") as f:
+        ...     _ = f.seek(-1, os.SEEK_END)
+        ...     _ = f.write(bytes([9]))
+        >>> t.load_from_file(path)
+        Traceback (most recent call last):
+        ...
+        ValueError: Map ... has unknown tile types [9]
+        >>> TerrainMap("assets/other.png", 20, 20).load_from_file(path)
+        Traceback (most recent call last):
+        ...
+        ValueError: Map ... uses tile sheet assets/tiles.png, expected assets/other.png
+        """
+        header = read_map_header(filename)
+        
+        if (os.path.normpath(header.sheet_name) !=
+            os.path.normpath(self._sheet_name)):
+            raise ValueError("Map {} uses tile sheet {}, expected {}".format(
+                filename, header.sheet_name, self._sheet_name))
+        
+        tile_size = (header.tile_width, header.tile_height)
+        if tile_size != self._base_tile_size:
+            raise ValueError("Map {} has {}x{} tiles, expected {}x{}".format(
+                filename, *(tile_size + self._base_tile_size)))
+        
+        # Map the tiles copy-on-write, so changes never reach the file
+        tiles = numpy.memmap(filename,
+                             dtype = numpy.uint8,
+                             mode = 'c',
+                             offset = header.data_offset,
+                             shape = (header.width * header.height,))
+        
+        # Check the tiles in blocks, so checking doesn't need much memory
+        for start in range(0, tiles.size, _CHECK_BLOCK_SIZE):
+            check_tile_types(tiles[start:start + _CHECK_BLOCK_SIZE],
+                             "Map {}".format(filename))
+        
+        self._map_width, self._map_height = header.width, header.height
+        return memoryview(tiles)
+        
+    def save_binary(self, filename):
+        """
+        Writes the map to a binary map file, which can be loaded much faster
+        than an image.
+        """
+        sheet_name = self._sheet_name.encode("utf-8")
+        tile_w, tile_h = self._base_tile_size
+        
+        with open(filename, "wb") as f:
+            f.write(_TMAP_HEADER.pack(TMAP_MAGIC,
+                                      self._map_width,
+                                      self._map_height,
+                                      tile_w,
+                                      tile_h,
+                                      len(sheet_name)))
+            f.write(sheet_name)
+            f.write(self._tiles)
+        
+    def get_map_size(self):
+        """
+        Returns a tuple containing the width and height of the map, in tiles.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.get_map_size()
+        (5, 5)
+        """
+        return (self._map_width, self._map_height)
+        
+    def tile_data(self, coords):
+        """
+        Returns the tile data for a given tile.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.tile_data((0, 0)) == tile_types[0]
+        True
+        >>> t.tile_data((1, 1)) == tile_types[6]
+        True
+        
+        """
+        if not self._tile_exists(coords): return False
+        
+        index = self._tile_index(coords)
+        
+        return _tile_table[self._tiles[index]]
+        
+    def get_tile_id(self, coords):
+        """
+        Returns the ID of the tile type at the given coordinates, or -1 if
+        there's no tile there.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.get_tile_id((4, 0))
+        4
+        >>> t.get_tile_id((7, 0))
+        -1
+        """
+        if not self._tile_exists(coords): return -1
+        
+        return self._tiles[self._tile_index(coords)]
+        
+    def set_tile(self, coords, tile_id):
+        """
+        Changes the type of the tile at the given coordinates, e.g. to leave
+        a crater or build a bridge. Only the rendered chunk containing the
+        tile is redrawn, and each terrain listener is called with the
+        coordinates, the old tile ID and the new one.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> changes = []
+        >>> t.add_terrain_listener(lambda *change: changes.append(change))
+        >>> t.set_tile((2, 0), 4)
+        >>> t.tile_data((2, 0)).type, t.terrain_version, changes
+        ('road', 1, [((2, 0), 2, 4)])
+        >>> t.set_tile((2, 0), 99)
+        Traceback (most recent call last):
+        ...
+        ValueError: No tile type 99
+        """
+        if not self._tile_exists(coords):
+            raise ValueError("No tile at {}".format(coords))
+        if tile_id not in tile_types:
+            raise ValueError("No tile type {}".format(tile_id))
+        
+        index = self._tile_index(coords)
+        old_id = self._tiles[index]
+        if old_id == tile_id: return
+        
+        self._tiles[index] = tile_id
+        self.terrain_version += 1
+        self._invalidate_tile(coords)
+        
+        for listener in self._terrain_listeners:
+            listener(coords, old_id, tile_id)
+        
+    def add_terrain_listener(self, listener):
+        """
+        Adds a function to be called as listener(coords, old_id, new_id)
+        whenever a tile is changed with set_tile.
+        """
+        self._terrain_listeners.append(listener)
+        
+    def remove_terrain_listener(self, listener):
+        """
+        Removes a terrain listener. Does nothing if it isn't registered.
+        """
+        if listener in self._terrain_listeners:
+            self._terrain_listeners.remove(listener)
+        
+    def is_passable(self, coords):
+        """
+        Returns whether the terrain at the given coordinates can be crossed.
+        Tiles off the map can't be.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.is_passable((0, 0)), t.is_passable((1, 0)), t.is_passable((9, 9))
+        (True, False, False)
+        """
+        if not self._tile_exists(coords): return False
+        
+        return bool(_passable[self._tiles[self._tile_index(coords)]])
+        
+    def get_defense_bonus(self, coords):
+        """
+        Returns the defense bonus of the terrain at the given coordinates, or
+        0 if there's no tile there.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.get_defense_bonus((1, 1))
+        2
+        """
+        if not self._tile_exists(coords): return 0
+        
+        return int(_defense_bonus[self._tiles[self._tile_index(coords)]])
+        
+    def get_range_bonus(self, coords):
+        """
+        Returns the range bonus of the terrain at the given coordinates, or
+        0 if there's no tile there.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.get_range_bonus((0, 1))
+        2
+        """
+        if not self._tile_exists(coords): return 0
+        
+        return int(_range_bonus[self._tiles[self._tile_index(coords)]])
+        
+    def query_tiles(self, coords):
+        """
+        Looks up the tile data of many tiles at once. coords is a sequence
+        of (x, y) tile coordinates, or an array of shape (n, 2). Returns a
+        TileColumns of arrays in the same order. Tiles off the map have ID
+        -1, aren't passable and have no bonuses.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> columns = t.query_tiles([(0, 0), (1, 1), (0, 1), (-1, 0)])
+        >>> columns.ids.tolist()
+        [0, 6, 5, -1]
+        >>> columns.passable.tolist()
+        [True, True, False, False]
+        >>> columns.defense_bonus.tolist(), columns.range_bonus.tolist()
+        ([0, 2, 1, 0], [0, 0, 2, 0])
+        """
+        coords = numpy.asarray(coords, dtype = numpy.intp).reshape(-1, 2)
+        x = coords[:, 0]
+        y = coords[:, 1]
+        
+        exists = ((x >= 0) & (x < self._map_width) &
+                  (y >= 0) & (y < self._map_height))
+        
+        return self._query(numpy.where(exists, y * self._map_width + x, 0),
+                           exists)
+        
+    def query_indices(self, indices):
+        """
+        Looks up the tile data of many tiles at once, given their indices
+        in the list of tiles. Returns a TileColumns of arrays in the same
+        order, as for query_tiles.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> columns = t.query_indices([4, 5, 25])
+        >>> columns.ids.tolist(), columns.exists.tolist()
+        ([4, 5, -1], [True, True, False])
+        """
+        indices = numpy.asarray(indices, dtype = numpy.intp).ravel()
+        exists = (indices >= 0) & (indices < self._tile_count())
+        
+        return self._query(numpy.where(exists, indices, 0), exists)
+        
+    def _query(self, indices, exists):
+        """
+        Returns the TileColumns for the given tile indices. Indices where
+        exists is false are ignored.
+        """
+        ids = self._tile_grid.ravel()[indices]
+        
+        return TileColumns(
+            numpy.where(exists, ids.astype(numpy.int16), -1),
+            exists,
+            exists & _passable[ids],
+            numpy.where(exists, _defense_bonus[ids], 0),
+            numpy.where(exists, _range_bonus[ids], 0))
+        
+    def neighbours(self, coords):
+        """
+        Returns all neighbour coordinates to a given tile. Does not return
+        coordinates which do not exist.
+        
+        >>> t = TerrainMap("assets/tiles.png", 20, 20)
+        >>> t.load_grid([[0, 1, 2, 3, 4], [5, 6, 0, 0, 0]] + [[0] * 5] * 3)
+        >>> t.neighbours((0, 0))
+        [(1, 0), (0, 1)]
+        >>> t.neighbours((4, 4))
+        [(4, 3), (3, 4)]
+        >>> t.neighbours((1, 1))
+        [(1, 0), (2, 1), (0, 1), (1, 2)]
+        """
+        x, y = coords
+        
+        # The possible neighbouring tiles.
+        neighbours = [
+            (x, y - 1),
+            (x + 1, y),
+            (x - 1, y),
+            (x, y + 1)
+        ]
+        
+        # Return only those which exist.
+        return [n for n in neighbours if self._tile_exists(n)]
+        
+def better_tile(a, b, start, end):
+    """
+    Picks the best tile to use. This is used in case of a tie in the
+    priority queue. Returns True if choosing tile a, or False for tile b.
+    The tile with the closest slope to the slope between start and end
+    will be given priority. If there's still a tie, the tile with the
+    lowest Y is chosen. Finally, if that fails, the tile with the lowest
+    X is chosen.
+    
+    Examples:
+    The best tile here is (1, 1), as it lies directly on the line:
+    >>> better_tile((1, 1), (1, 2), (0, 0), (3, 3))
+    True
+    
+    The best tile here is (1, 4), as it lies closer to the line:
+    >>> better_tile((1, 1), (1, 4), (0, 3), (3, 3))
+    False
+    
+    Both tiles are equidistant to the line, so we choose the lowest Y,
+    (1, 0):
+    >>> better_tile((0, 1), (1, 0), (0, 0), (3, 3))
+    False
+    
+    Both tiles are equidistant to the line and have equal Y, so we
+    choose the lowest X, (3, 1):
+    >>> better_tile((3, 1), (5, 1), (4, 0), (4, 4))
+    True
+    """
+    dist_a = round(helper.squared_segment_dist(a, start, end), 3)
+    dist_b = round(helper.squared_segment_dist(b, start, end), 3)
+    
+    # Choose the lowest difference from the line
+    if dist_a < dist_b:
+        return True
+    elif dist_a > dist_b:
+        return False
+    else:
+        # Still a tie - choose lowest Y
+        if a[1] < b[1]:
+            return True
+        elif a[1] > b[1]:
+            return False
+        else:
+            # Still a tie - choose lowest X
+            if a[0] < b[0]:
+                return True
+            else:
+                return False
+            
+def find_path(graph,
+                start,
+                end,
+                cost = lambda pos: 1,
+                passable = lambda pos: True,
+                heuristic = helper.manhattan_dist):
+    """
+    Returns the path between two nodes as a list of nodes using the A*
+    algorithm.
+    If no path could be found, an empty list is returned.
+    
+    The cost function is how much it costs to leave the given node. This should
+    always be greater than or equal to 1, or shortest path is not guaranteed.
+    
+    The passable function returns whether the given node is passable.
+    
+    The heuristic function takes two nodes and computes the distance between the
+    two. Underestimates are guaranteed to provide an optimal path, but it may
+    take longer to compute the path. Overestimates lead to faster path
+    computations, but may not give an optimal path.
+    
+    Code based on algorithm described in:
+    http://www.policyalmanac.org/games/aStarTutorial.htm
+    
+    Example use:
+    >>> t = TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0] * 5] * 5)
+    
+    >>> find_path(t, (0, 0), (4, 4))
+    [(0, 0), (1, 0), (1, 1), (2, 1), (2, 2), (3, 2), (3, 3), (4, 3), (4, 4)]
+    >>> find_path(t, (0, 0), (5, 5))
+    []
+    
+    >>> t = TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0, 0, 0, 0, 1, 0],
+    ...              [0, 1, 1, 1, 0, 0],
+    ...              [0, 0, 0, 0, 1, 0],
+    ...              [0, 1, 1, 0, 1, 0],
+    ...              [0, 0, 1, 0, 0, 0],
+    ...              [1, 0, 0, 0, 1, 0]])
+    >>> cost = lambda c: 1
+    >>> passable = lambda c: t.tile_data(c).passable
+   
+    >>> find_path(t, (2, 0), (4, 1), cost, passable) == [(2, 0), (1, 0), (0, 0),
+    ... (0, 1), (0, 2), (1, 2), (2, 2), (3, 2), (3, 3), (3, 4), (4, 4), (5, 4),
+    ... (5, 3), (5, 2), (5, 1), (4, 1)]
+    True
+    """
+    # tiles to check (tuples of (x, y), cost)
+    todo = pqueue.PQueue()
+    todo.update(start, 0)
+    
+    # tiles we've been to
+    visited = set()
+    
+    # associated G and H costs for each tile (tuples of G, H)
+    costs = { start: (0, heuristic(start, end)) }
+    
+    # parents for each tile
+    parents = {}
+    
+    while todo and (end not in visited):
+        todo.tie_breaker = lambda a,b: better_tile(a, b, start, end)
+    
+        cur, c = todo.pop_smallest()
+        visited.add(cur)
+        
+        # check neighbours
+        for n in graph.neighbours(cur):
+            # skip it if we've already checked it, or if it isn't passable
+            if ((n in visited) or
+                (not passable(n))):
+                continue
+                
+            if not (n in todo):
+                # we haven't looked at this tile yet, so calculate its costs
+                g = costs[cur][0] + cost(cur)
+                h = heuristic(n, end)
+                costs[n] = (g, h)
+                parents[n] = cur
+                todo.update(n, g + h)
+            else:
+                # if we've found a better path, update it
+                g, h = costs[n]
+                new_g = costs[cur][0] + cost(cur)
+                if new_g < g:
+                    g = new_g
+                    todo.update(n, g + h)
+                    costs[n] = (g, h)
+                    parents[n] = cur
+    
+    # we didn't find a path
+    if end not in visited:
+        return []
+    
+    # build the path backward
+    path = []
+    while end != start:
+        path.append(end)
+        end = parents[end]
+    path.append(start)
+    path.reverse()
+    
+    return path
+    
+def reachable_tiles(graph,
+                      start,
+                      max_cost,
+                      cost = lambda pos: 1,
+                      passable = lambda pos: True):
+    """
+    Returns a set of nodes which can be reached with a total cost of max_cost.
+    The cost function is how much it costs to leave the given node. This should
+    always be greater than or equal to 1, or shortest path is not guaranteed.
+    The passable function returns whether the given node.
+    
+    Example use:
+    >>> t = TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0] * 5] * 5)
+    
+    >>> reachable_tiles(t, (2, 2), 2) == set([(2, 0), (1, 1), (2, 1), (3, 1),
+    ... (0, 2), (1, 2), (2, 2), (3, 2), (4, 2), (1, 3), (2, 3), (3, 3), 
+    ... (2, 4)])
+    True
+    
+    >>> t = TerrainMap("assets/tiles.png", 20, 20)
+    >>> t.load_grid([[0, 0, 0, 0, 1, 0],
+    ...              [0, 1, 1, 1, 0, 0],
+    ...              [0, 0, 0, 0, 1, 0],
+    ...              [0, 1, 1, 0, 1, 0],
+    ...              [0, 0, 1, 0, 0, 0],
+    ...              [1, 0, 0, 0, 1, 0]])
+    >>> cost = lambda c: 1
+    >>> passable = lambda c: t.tile_data(c).passable
+   
+    >>> reachable_tiles(t, (2, 0), 6, cost, passable) == set([(3, 0), (2, 0),
+    ... (1, 0), (0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (2, 2)])
+    True
+    """
+    # tiles to check (tuples of x, y)
+    todo = pqueue.PQueue()
+    todo.update(start, 0)
+    
+    # tiles we've been to
+    visited = set()
+    
+    # tiles which we can get to within max_cost
+    reachable = set()
+    reachable.add(start)
+    
+    while todo:
+        cur, c = todo.pop_smallest()
+        visited.add(cur)
+        
+        # it's too expensive to get here, so don't bother checking
+        if c > max_cost:
+            continue
+        
+        # check neighbours
+        for n in graph.neighbours(cur):
+            # skip it if it doesn't exist, if we've already checked it, or
+            # if it isn't passable
+            if ((n in visited) or
+                (not passable(n))):
+                continue
+            
+            # try updating the tile's cost
+            new_cost = c + cost(cur)
+            if todo.update(n, new_cost) and new_cost <= max_cost:
+                reachable.add(n)
+    
+    return reachable
@@ -1,33 +1,87 @@
 import pygame, sys, math
 import pygame.gfxdraw
-import pqueue, helper
+import numpy
+import cache
+from images import ImageManager
+from camera import Camera
 from pygame.sprite import Sprite
-from collections import namedtuple
 
-# A container class which stores information about a tile.
-Tile = namedtuple('Tile', ['type',
-                           'sprite_id',
-                           'passable',
-                           'defense_bonus',
-                           'range_bonus'])
-
-# a dictionary of tile IDs associated with their type data
-tile_types = {
-    0:  Tile('plains', 0, True, 0, 0),
-    1:  Tile('wall', 1, False, 0, 0),
-    2:  Tile('water', 2, False, 0, 0),
-    3:  Tile('sand', 3, True, 0, 0),
-    4:  Tile('road', 4, True, 0, 0),
-    5:  Tile('mountain', 5, False, 1, 2),
-    6:  Tile('forest', 6, True, 2, 0)
-}
+# The terrain itself doesn't need pygame, so it lives in its own module.
+# Its names are kept here for the code which uses them through this one.
+import terrain
+from terrain import (Tile, TileColumns, tile_types, MapHeader, TMAP_MAGIC,
+                     is_binary_map, is_gif_map, read_map_header,
+                     read_gif_map, check_tile_types, TerrainMap,
+                     better_tile, find_path, reachable_tiles)
 
 HIGHLIGHT_RATE = 0.0025
 GRID_COLOR = (0, 0, 0, 80)
 
-class TileMap(Sprite):
+# The terrain is rendered in square chunks of this many tiles per side
+CHUNK_SIZE = 32
+
+# Roughly how many bytes of rendered chunks to keep around
+CHUNK_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# After a zoom, how many chunks are rendered each frame until the view is
+# filled in
+CHUNKS_PER_FRAME = 2
+
+def read_image_map(filename):
     """
-    A class which renders a grid of tiles from a spritesheet.
+    Reads the tiles of an indexed image map into a (height, width) array of
+    tile IDs. The tile number of each pixel is its colour index.
+    
+    >>> read_image_map("maps/test-1.gif")[1].tolist()
+    [5, 6, 0, 0, 0]
+    """
+    # Load in the map image.
+    map_image = pygame.image.load(filename)
+    if map_image.get_bitsize() != 8:
+        raise ValueError(
+            "Map {} does not have an 8-bit palette".format(filename))
+    
+    # Read every pixel's colour index at once. The array is indexed by
+    # (x, y), so it's transposed into row order.
+    tiles = pygame.surfarray.array2d(map_image).T.astype(
+        numpy.uint8, order = 'C')
+    
+    # Make sure every tile type exists
+    check_tile_types(tiles, "Map {}".format(filename))
+    return tiles
+    
+def convert_map(image_filename, tmap_filename, sheet_name,
+                tile_width, tile_height):
+    """
+    Converts an indexed image map into a binary map which uses the given
+    tile sheet and tile size.
+    
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "test-1.tmap")
+    >>> convert_map("maps/test-1.gif", path, "assets/tiles.png", 20, 20)
+    >>> read_map_header(path)[:5]
+    (5, 5, 20, 20, 'assets/tiles.png')
+    >>> t = TileMap("assets/tiles.png", 20, 20)
+    >>> t.load_from_file(path)
+    >>> t.get_tiles() == [0, 1, 2, 3, 4, 5, 6, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    ...                   0, 0, 0, 0, 0, 0, 0, 0]
+    True
+    """
+    tile_map = TileMap(sheet_name, tile_width, tile_height)
+    tile_map.load_from_file(image_filename)
+    tile_map.save_binary(tmap_filename)
+
+class TileMap(TerrainMap, Sprite):
+    """
+    A TerrainMap which renders its tiles from a spritesheet. Only the part
+    of the map inside its camera's view is drawn. The terrain is rendered
+    in chunks as they come into view, and the least recently seen chunks
+    are thrown away once they use up CHUNK_MEMORY_BUDGET.
+    
+    The map can be zoomed, in which case tiles are drawn from a scaled copy
+    of the sprite sheet and all coordinates use the scaled tile size. The
+    chunks in view are then rendered a few at a time over the next frames,
+    with the old zoom level's chunks stretched to stand in until then.
     """
     
     def __init__(self, sheet_name, tile_width, tile_height):
@@ -36,81 +90,35 @@ class TileMap(Sprite):
         tile_width: the width of each tile, in pixels
         tile_height: the height of each tile, in pixels
         """
+        TerrainMap.__init__(self, sheet_name, tile_width, tile_height)
         
         # Set up map info
-        self._sprite_sheet = pygame.image.load(sheet_name)
+        self._sprite_sheet = ImageManager.load(sheet_name)
         self._tile_width = tile_width
         self._tile_height = tile_height
-        self._map_width = None
-        self._map_height = None
-        self._tiles = []
+        
+        # The zoom level, and the pixels of each tile sprite at that zoom
+        self.zoom = 1
+        self._tile_pixels = self._slice_tiles(self._sprite_sheet)
         self._highlights = {}
+        self.camera = None
         
         Sprite.__init__(self)
         
         # These are required for a pygame Sprite
         self.image = None
-        self._base_image = None
         self.rect = pygame.Rect(0, 0, 0, 0)
         
-    def _tile_count(self):
-        """
-        Returns the number of tiles on the map.
-        
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t._tile_count()
-        25
-        """
-        return self._map_width * self._map_height
-        
-    def _tile_position(self, index):
-        """
-        Returns a tile's coordinates in tile units within the map given its
-        index in the list.
-        
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t._tile_position(12)
-        (2, 2)
-        """
-        return (index % self._map_width, index // self._map_width)
+        # Rendered terrain chunks, by chunk coordinates, and the chunks
+        # from before the last zoom
+        self._chunks = None
+        self._old_chunks = None
         
-    def _tile_exists(self, coords):
-        """
-        Returns true if a tile exists, or false if it doesn't
+        # The average colour of each tile type, by tile ID, once needed
+        self._tile_colors = None
         
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t._tile_exists((2, 2))
-        True
-        >>> t._tile_exists((-2, -1))
-        False
-        >>> t._tile_exists((6, 7))
-        False
-        """
-        return not (
-            coords[0] < 0 or
-            coords[0] >= self._map_width or
-            coords[1] < 0 or
-            coords[1] >= self._map_height)
-        
-    def _tile_index(self, coords):
-        """
-        Returns a tile's index in the list given its tile coordinates in tile
-        units. Returns -1 if the provided coordinates are invalid.
-        
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t._tile_index((2, 2))
-        12
-        """
-        if not self._tile_exists(coords): return -1
-
-        #make sure to cast to int because input is sometimes floats
-        #There won't be rounding errors though because the numbers
-        #are just integers with .0 after
-        return int(coords[1]) * self._map_width + int(coords[0])
+        # The part of the map which is currently drawn, in map pixels
+        self._visible_area = pygame.Rect(0, 0, 0, 0)
         
     def _get_highlight_color(self, colorA, colorB):
         """
@@ -127,62 +135,143 @@ class TileMap(Sprite):
         
         return (r, g, b, a)
         
-    def _render_base_image(self, redraw = []):
+    def _slice_tiles(self, sheet):
+        """
+        Returns the pixels of each sprite in a sheet of tiles at the current
+        tile size, as an array indexed by (sprite ID, x, y, colour).
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t._tile_pixels.shape
+        (10, 20, 20, 3)
+        """
+        count = sheet.get_width() // self._tile_width
+        
+        # Draw the sheet onto black, which is what tiles are drawn over
+        opaque = pygame.Surface((count * self._tile_width, self._tile_height))
+        opaque.blit(sheet, (0, 0))
+        
+        pixels = pygame.surfarray.array3d(opaque)
+        return pixels.reshape(count, self._tile_width, self._tile_height, 3)
+        
+    def _chunk_pixel_size(self):
+        """
+        Returns the width and height of a full chunk, in pixels.
         """
-        Redraws all the tiles onto the base image.
+        return (CHUNK_SIZE * self._tile_width, CHUNK_SIZE * self._tile_height)
+        
+    def _chunk_coords(self, coords):
         """
+        Returns the coordinates of the chunk containing the given tile.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t._chunk_coords((40, 70))
+        (1, 2)
+        """
+        return (int(coords[0]) // CHUNK_SIZE, int(coords[1]) // CHUNK_SIZE)
+        
+    def _render_chunk(self, chunk):
+        """
+        Returns a new surface with the tiles of the given chunk drawn on it.
+        Chunks along the right and bottom edges may be smaller than the rest.
+        """
+        left = chunk[0] * CHUNK_SIZE
+        top = chunk[1] * CHUNK_SIZE
+        right = min(left + CHUNK_SIZE, self._map_width)
+        bottom = min(top + CHUNK_SIZE, self._map_height)
+        
         # Create the empty surface
-        self._base_image = pygame.Surface(
-            (self._tile_width * self._map_width,
-            self._tile_height * self._map_height)
+        surface = pygame.Surface(
+            ((right - left) * self._tile_width,
+            (bottom - top) * self._tile_height)
         )
         
-        # draw in each tile
-        for i in range(self._tile_count()):
-            tile_id = tile_types[self._tiles[i]].sprite_id
+        # Look up each tile's sprite, then its pixels, and lay them out in
+        # a (x, y, colour) grid the size of the surface
+        sprites = terrain._sprite_ids[self._tile_grid[top:bottom, left:right]].T
+        pixels = self._tile_pixels[sprites].transpose(0, 2, 1, 3, 4)
+        pygame.surfarray.blit_array(
+            surface,
+            pixels.reshape(surface.get_width(), surface.get_height(), 3))
+                
+        return surface
+        
+    def _get_chunk(self, chunk):
+        """
+        Returns the surface for the given chunk, rendering it if it isn't
+        cached.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> len(t._chunks)
+        0
+        >>> t._get_chunk((0, 0)).get_size()
+        (100, 100)
+        >>> len(t._chunks)
+        1
+        """
+        return self._chunks.get_or_create(
+            chunk,
+            lambda: self._render_chunk(chunk))
             
-            # get its position from its index in the list
-            x, y = self._tile_position(i)
-            x *= self._tile_width
-            y *= self._tile_height
+    def _stand_in_chunk(self, chunk):
+        """
+        Returns a quick stand-in for the given chunk: the chunk as rendered
+        before the last zoom, stretched to the current tile size, or if it
+        wasn't rendered then, each tile filled with its average colour.
+        """
+        left = chunk[0] * CHUNK_SIZE
+        top = chunk[1] * CHUNK_SIZE
+        right = min(left + CHUNK_SIZE, self._map_width)
+        bottom = min(top + CHUNK_SIZE, self._map_height)
+        size = ((right - left) * self._tile_width,
+                (bottom - top) * self._tile_height)
+        
+        old = self._old_chunks.get(chunk)
+        if old is None:
+            if self._tile_colors is None:
+                self._tile_colors = numpy.zeros((256, 3), dtype = numpy.uint8)
+                for tile_id in tile_types:
+                    self._tile_colors[tile_id] = self.get_tile_color(tile_id)
             
-            # determine which subsection to draw based on the sprite id
-            area = pygame.Rect(
-                tile_id * self._tile_width,
-                0,
-                self._tile_width,
-                self._tile_height
-            )
+            old = pygame.surfarray.make_surface(
+                self._tile_colors[self._tile_grid[top:bottom, left:right].T])
             
-            # draw the tile
-            self._base_image.blit(self._sprite_sheet, (x, y), area)
+        return pygame.transform.scale(old, size)
             
-    def _set_tiles(self, tiles):
+    def _invalidate_tile(self, coords):
         """
-        Sets the list of tiles.
+        Throws away the rendered chunk containing the given tile, so that it
+        is redrawn the next time it's visible.
         """
-        self._tiles = tiles[:]
+        self._chunks.discard(self._chunk_coords(coords))
+        if self._old_chunks is not None:
+            self._old_chunks.discard(self._chunk_coords(coords))
         
-        # The image now needs to be redrawn
-        self._render_base_image()
-            
-    def get_tiles(self):
+    def _set_tiles(self, tiles):
         """
-        Returns a copy of the list of tiles.
+        Sets the tiles, as for TerrainMap, and starts rendering them afresh.
+        """
+        TerrainMap._set_tiles(self, tiles)
         
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t.get_tiles() == [0, 1, 2, 3, 4, 5, 6, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-        ...                   0, 0, 0, 0, 0, 0, 0, 0]
-        True
+        # Throw away any old chunks; they're rendered again when visible
+        self._chunks = self._new_chunk_cache()
+        self._old_chunks = None
+        
+    def _new_chunk_cache(self):
+        """
+        Returns an empty chunk cache sized to fit the chunk memory budget at
+        the current zoom level.
         """
-        return self._tiles[:]
+        chunk_w, chunk_h = self._chunk_pixel_size()
+        return cache.LRUCache(
+            max(CHUNK_MEMORY_BUDGET // (chunk_w * chunk_h * 4), 9))
             
     def load_from_file(self, filename):
         """
-        Loads tile data from the given image file.
+        Loads tile data from the given binary map or image file.
         The image file should be have an 8-bit indexed palette. Each colour
         index corresponds to the tile (e.g. colour index 2 = tile type 2)
+        Binary maps are memory-mapped rather than read in full.
         
         >>> t = TileMap("assets/tiles.png", 20, 20)
         >>> t.load_from_file("maps/test-1.gif")
@@ -191,25 +280,174 @@ class TileMap(Sprite):
         >>> t.get_tiles() == [0, 1, 2, 3, 4, 5, 6, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
         ...                   0, 0, 0, 0, 0, 0, 0, 0]
         True
-        """
-        tiles = []
         
-        # Load in the map image.
-        map_image = pygame.image.load(filename)
-        self._map_width, self._map_height = map_image.get_size()
-        self.rect.w = self._map_width * self._tile_width
-        self.rect.h = self._map_height * self._tile_height
+        Images which aren't indexed can't be loaded:
+        >>> t.load_from_file("assets/tiles.png")
+        Traceback (most recent call last):
+        ...
+        ValueError: Map assets/tiles.png does not have an 8-bit palette
+        """
+        if is_binary_map(filename):
+            tiles = self._load_binary(filename)
+        elif is_gif_map(filename):
+            tiles = self._load_gif(filename)
+        else:
+            tiles = self._load_image(filename)
         
-        # Go through the image adding tiles
-        map_tiles = []
-        for y in range(map_image.get_height()):
-            for x in range(map_image.get_width()):
-                # The tile number corresponds to the pixel colour index
-                tiles.append(map_image.get_at_mapped((x, y)))
+        # Show the whole map at the top-left until given a view
+        map_w, map_h = self.get_pixel_size()
+        self.camera = Camera(pygame.Rect(0, 0, map_w, map_h), map_w, map_h)
+        self._update_rect()
         
         # Set the tiles
         self._set_tiles(tiles)
         
+    def _load_image(self, filename):
+        """
+        Reads the map size and tiles from an indexed image file.
+        """
+        tiles = read_image_map(filename)
+        self._map_height, self._map_width = tiles.shape
+        return tiles
+        
+    def get_tile_color(self, tile_id):
+        """
+        Returns the average colour of the given tile type's sprite.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.get_tile_color(2)[2] > t.get_tile_color(2)[0]
+        True
+        """
+        base_w, base_h = self._base_tile_size
+        area = pygame.Rect(tile_types[tile_id].sprite_id * base_w,
+                           0,
+                           base_w,
+                           base_h)
+        return pygame.transform.average_color(self._sprite_sheet, area)[:3]
+        
+    def get_pixel_size(self):
+        """
+        Returns a tuple containing the width and height of the whole map, in
+        pixels.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> t.get_pixel_size()
+        (100, 100)
+        """
+        return (self._map_width * self._tile_width,
+                self._map_height * self._tile_height)
+        
+    def set_view(self, view_rect):
+        """
+        Shows the map inside the given screen rectangle. The map is centred
+        if it fits, or can be scrolled if it doesn't.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> t.set_view(pygame.Rect(0, 0, 300, 200))
+        >>> t.rect
+        <rect(100, 50, 100, 100)>
+        """
+        self.camera = Camera(view_rect, *self.get_pixel_size())
+        self._update_rect()
+        
+    def scroll(self, dx, dy):
+        """
+        Scrolls the view of the map by the given number of pixels.
+        """
+        self.camera.scroll(dx, dy)
+        self._update_rect()
+        
+    def set_zoom(self, zoom):
+        """
+        Changes the zoom level, where 1 draws tiles at their normal size.
+        The tile at the centre of the view stays there. Chunks rendered at
+        the old zoom level are only kept until new ones replace them.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> t.set_zoom(0.5)
+        >>> t.get_tile_size()
+        (10, 10)
+        >>> t.get_pixel_size()
+        (50, 50)
+        >>> t.screen_coords((3, 4))
+        (55, 65)
+        
+        The chunks in view are rendered a few at a time after a zoom.
+        
+        >>> t.load_grid([[0] * 200] * 200)
+        >>> t.set_view(pygame.Rect(0, 0, 800, 600))
+        >>> t.set_zoom(0.25)
+        >>> t.update()
+        >>> len(t._chunks) == CHUNKS_PER_FRAME
+        True
+        >>> for _ in range(20): t.update()
+        >>> len(t._chunks), t._old_chunks
+        (20, None)
+        """
+        if zoom == self.zoom: return
+        
+        # Find the point in the middle of the view, in tile units
+        center_x, center_y = self.camera.to_map(*self.camera.view_rect.center)
+        center_x /= self._tile_width
+        center_y /= self._tile_height
+        
+        # Scale the tiles
+        base_w, base_h = self._base_tile_size
+        self.zoom = zoom
+        self._tile_width = max(1, round(base_w * zoom))
+        self._tile_height = max(1, round(base_h * zoom))
+        
+        if zoom == 1:
+            sheet = self._sprite_sheet
+        else:
+            sheet_w = self._sprite_sheet.get_width() // base_w
+            sheet = pygame.transform.smoothscale(
+                self._sprite_sheet,
+                (sheet_w * self._tile_width, self._tile_height))
+        self._tile_pixels = self._slice_tiles(sheet)
+        
+        # The old chunks are the wrong size now, but they can stand in for
+        # new ones until those are rendered
+        self._old_chunks = self._chunks
+        self._chunks = self._new_chunk_cache()
+        
+        # Keep the same tile in the middle of the view
+        self.camera.set_map_size(*self.get_pixel_size())
+        self.camera.center_on(center_x * self._tile_width,
+                              center_y * self._tile_height)
+        self._update_rect()
+        
+    def _update_rect(self):
+        """
+        Moves the sprite rectangle to cover the visible part of the map.
+        """
+        self._visible_area = self.camera.visible_area()
+        self.rect = pygame.Rect(
+            self.camera.to_screen(*self._visible_area.topleft),
+            self._visible_area.size)
+        
+    def visible_tiles(self):
+        """
+        Returns a rectangle, in tile units, containing every tile which is
+        at least partly visible.
+        
+        >>> t = TileMap("assets/tiles.png", 20, 20)
+        >>> t.load_from_file("maps/test-1.gif")
+        >>> t.set_view(pygame.Rect(0, 0, 50, 50))
+        >>> t.scroll(30, 0)
+        >>> t.visible_tiles()
+        <rect(1, 0, 3, 3)>
+        """
+        area = self._visible_area
+        left = area.left // self._tile_width
+        top = area.top // self._tile_height
+        right = -(-area.right // self._tile_width)
+        bottom = -(-area.bottom // self._tile_height)
+        return pygame.Rect(left, top, right - left, bottom - top)
+        
     def get_tile_size(self):
         """
         Returns a tuple containing a tile's width and height within this map.
@@ -231,10 +469,10 @@ class TileMap(Sprite):
         >>> t.tile_coords((45, 22))
         (2, 1)
         """
-        x, y = screen_coords
+        x, y = self.camera.to_map(*screen_coords)
         return (
-            math.floor((x - self.rect.left) / self._tile_width),
-            math.floor((y - self.rect.top) / self._tile_height)
+            math.floor(x / self._tile_width),
+            math.floor(y / self._tile_height)
         )
         
     def screen_coords(self, tile_coords):
@@ -247,55 +485,8 @@ class TileMap(Sprite):
         (60, 80)
         """
         x, y = tile_coords
-        return (
-            x * self._tile_width + self.rect.x,
-            y * self._tile_height + self.rect.y
-        )
-        
-    def tile_data(self, coords):
-        """
-        Returns the tile data for a given tile.
-        
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t.tile_data((0, 0)) == tile_types[0]
-        True
-        >>> t.tile_data((1, 1)) == tile_types[6]
-        True
-        
-        """
-        if not self._tile_exists(coords): return False
-        
-        index = self._tile_index(coords)
-        
-        return tile_types[self._tiles[index]]
-        
-    def neighbours(self, coords):
-        """
-        Returns all neighbour coordinates to a given tile. Does not return
-        coordinates which do not exist.
-        
-        >>> t = TileMap("assets/tiles.png", 20, 20)
-        >>> t.load_from_file("maps/test-1.gif")
-        >>> t.neighbours((0, 0))
-        [(1, 0), (0, 1)]
-        >>> t.neighbours((4, 4))
-        [(4, 3), (3, 4)]
-        >>> t.neighbours((1, 1))
-        [(1, 0), (2, 1), (0, 1), (1, 2)]
-        """
-        x, y = coords
-        
-        # The possible neighbouring tiles.
-        neighbours = [
-            (x, y - 1),
-            (x + 1, y),
-            (x - 1, y),
-            (x, y + 1)
-        ]
-        
-        # Return only those which exist.
-        return [n for n in neighbours if self._tile_exists(n)]
+        return self.camera.to_screen(x * self._tile_width,
+                                     y * self._tile_height)
         
     def set_highlight(self, name, colorA, colorB, tiles):
         """
@@ -322,254 +513,60 @@ class TileMap(Sprite):
     def update(self):
         """
         Overrides the default update function for sprites. This updates
-        the image.
-        """
-        # copy over the base image
-        self.image = self._base_image.copy()
+        the image with the visible part of the map.
+        """
+        area = self._visible_area
+        
+        # Reuse the image unless the visible area has changed size
+        if not self.image or self.image.get_size() != area.size:
+            self.image = pygame.Surface(area.size)
+        
+        # copy over the visible part of each chunk in view. Just after a
+        # zoom, only a few of them are rendered each frame.
+        budget = CHUNKS_PER_FRAME
+        waiting = False
+        chunk_w, chunk_h = self._chunk_pixel_size()
+        for cy in range(area.top // chunk_h, (area.bottom - 1) // chunk_h + 1):
+            for cx in range(area.left // chunk_w, (area.right - 1) // chunk_w + 1):
+                chunk = (cx, cy)
+                pos = (cx * chunk_w - area.x, cy * chunk_h - area.y)
+                
+                surface = self._chunks.get(chunk)
+                if surface is None:
+                    if self._old_chunks is None or budget > 0:
+                        budget -= 1
+                        surface = self._get_chunk(chunk)
+                    else:
+                        waiting = True
+                        surface = self._stand_in_chunk(chunk)
+                
+                self.image.blit(surface, pos)
         
-        # draw the highlights
+        # The old chunks aren't needed once everything in view is rendered
+        if not waiting:
+            self._old_chunks = None
+        
+        # draw the visible highlights
+        visible = self.visible_tiles()
         for name, (tiles, colorA, colorB) in self._highlights.items():
+            color = self._get_highlight_color(colorA, colorB)
             for coord in tiles:
+                if not visible.collidepoint(coord):
+                    continue
                 tile_rect = pygame.Rect(
-                    coord[0] * self._tile_width,
-                    coord[1] * self._tile_height,
+                    coord[0] * self._tile_width - area.x,
+                    coord[1] * self._tile_height - area.y,
                     self._tile_width,
                     self._tile_height
                 )
-                pygame.gfxdraw.box(self.image,
-                                   tile_rect,
-                                   self._get_highlight_color(colorA, colorB))
+                pygame.gfxdraw.box(self.image, tile_rect, color)
             
-        # draw the grid
-        for x in range(0,
-                        self._map_width * self._tile_width,
+        # draw the visible grid lines
+        for x in range(visible.left * self._tile_width - area.x,
+                        area.w,
                         self._tile_width):
-            pygame.gfxdraw.vline(
-                self.image,
-                x,
-                0,
-                self._map_height * self._tile_height,
-                GRID_COLOR
-            )
-        for y in range(0,
-                        self._map_height * self._tile_height,
+            pygame.gfxdraw.vline(self.image, x, 0, area.h, GRID_COLOR)
+        for y in range(visible.top * self._tile_height - area.y,
+                        area.h,
                         self._tile_height):
-            pygame.gfxdraw.hline(
-                self.image,
-                0,
-                self._map_width * self._tile_width,
-                y,
-                GRID_COLOR
-            )
-    
-def better_tile(a, b, start, end):
-    """
-    Picks the best tile to use. This is used in case of a tie in the
-    priority queue. Returns True if choosing tile a, or False for tile b.
-    The tile with the closest slope to the slope between start and end
-    will be given priority. If there's still a tie, the tile with the
-    lowest Y is chosen. Finally, if that fails, the tile with the lowest
-    X is chosen.
-    
-    Examples:
-    The best tile here is (1, 1), as it lies directly on the line:
-    >>> better_tile((1, 1), (1, 2), (0, 0), (3, 3))
-    True
-    
-    The best tile here is (1, 4), as it lies closer to the line:
-    >>> better_tile((1, 1), (1, 4), (0, 3), (3, 3))
-    False
-    
-    Both tiles are equidistant to the line, so we choose the lowest Y,
-    (1, 0):
-    >>> better_tile((0, 1), (1, 0), (0, 0), (3, 3))
-    False
-    
-    Both tiles are equidistant to the line and have equal Y, so we
-    choose the lowest X, (3, 1):
-    >>> better_tile((3, 1), (5, 1), (4, 0), (4, 4))
-    True
-    """
-    dist_a = round(helper.squared_segment_dist(a, start, end), 3)
-    dist_b = round(helper.squared_segment_dist(b, start, end), 3)
-    
-    # Choose the lowest difference from the line
-    if dist_a < dist_b:
-        return True
-    elif dist_a > dist_b:
-        return False
-    else:
-        # Still a tie - choose lowest Y
-        if a[1] < b[1]:
-            return True
-        elif a[1] > b[1]:
-            return False
-        else:
-            # Still a tie - choose lowest X
-            if a[0] < b[0]:
-                return True
-            else:
-                return False
-            
-def find_path(graph,
-                start,
-                end,
-                cost = lambda pos: 1,
-                passable = lambda pos: True,
-                heuristic = helper.manhattan_dist):
-    """
-    Returns the path between two nodes as a list of nodes using the A*
-    algorithm.
-    If no path could be found, an empty list is returned.
-    
-    The cost function is how much it costs to leave the given node. This should
-    always be greater than or equal to 1, or shortest path is not guaranteed.
-    
-    The passable function returns whether the given node is passable.
-    
-    The heuristic function takes two nodes and computes the distance between the
-    two. Underestimates are guaranteed to provide an optimal path, but it may
-    take longer to compute the path. Overestimates lead to faster path
-    computations, but may not give an optimal path.
-    
-    Code based on algorithm described in:
-    http://www.policyalmanac.org/games/aStarTutorial.htm
-    
-    Example use:
-    >>> t = TileMap("assets/tiles.png", 20, 20)
-    >>> t.load_from_file("maps/test-2.gif")
-    
-    >>> find_path(t, (0, 0), (4, 4))
-    [(0, 0), (1, 0), (1, 1), (2, 1), (2, 2), (3, 2), (3, 3), (4, 3), (4, 4)]
-    >>> find_path(t, (0, 0), (5, 5))
-    []
-    
-    >>> t = TileMap("assets/tiles.png", 20, 20)
-    >>> t.load_from_file("maps/test-3.gif")
-    >>> cost = lambda c: 1
-    >>> passable = lambda c: t.tile_data(c).passable
-   
-    >>> find_path(t, (2, 0), (4, 1), cost, passable) == [(2, 0), (1, 0), (0, 0),
-    ... (0, 1), (0, 2), (1, 2), (2, 2), (3, 2), (3, 3), (3, 4), (4, 4), (5, 4),
-    ... (5, 3), (5, 2), (5, 1), (4, 1)]
-    True
-    """
-    # tiles to check (tuples of (x, y), cost)
-    todo = pqueue.PQueue()
-    todo.update(start, 0)
-    
-    # tiles we've been to
-    visited = set()
-    
-    # associated G and H costs for each tile (tuples of G, H)
-    costs = { start: (0, heuristic(start, end)) }
-    
-    # parents for each tile
-    parents = {}
-    
-    while todo and (end not in visited):
-        todo.tie_breaker = lambda a,b: better_tile(a, b, start, end)
-    
-        cur, c = todo.pop_smallest()
-        visited.add(cur)
-        
-        # check neighbours
-        for n in graph.neighbours(cur):
-            # skip it if we've already checked it, or if it isn't passable
-            if ((n in visited) or
-                (not passable(n))):
-                continue
-                
-            if not (n in todo):
-                # we haven't looked at this tile yet, so calculate its costs
-                g = costs[cur][0] + cost(cur)
-                h = heuristic(n, end)
-                costs[n] = (g, h)
-                parents[n] = cur
-                todo.update(n, g + h)
-            else:
-                # if we've found a better path, update it
-                g, h = costs[n]
-                new_g = costs[cur][0] + cost(cur)
-                if new_g < g:
-                    g = new_g
-                    todo.update(n, g + h)
-                    costs[n] = (g, h)
-                    parents[n] = cur
-    
-    # we didn't find a path
-    if end not in visited:
-        return []
-    
-    # build the path backward
-    path = []
-    while end != start:
-        path.append(end)
-        end = parents[end]
-    path.append(start)
-    path.reverse()
-    
-    return path
-    
-def reachable_tiles(graph,
-                      start,
-                      max_cost,
-                      cost = lambda pos: 1,
-                      passable = lambda pos: True):
-    """
-    Returns a set of nodes which can be reached with a total cost of max_cost.
-    The cost function is how much it costs to leave the given node. This should
-    always be greater than or equal to 1, or shortest path is not guaranteed.
-    The passable function returns whether the given node.
-    
-    Example use:
-    >>> t = TileMap("assets/tiles.png", 20, 20)
-    >>> t.load_from_file("maps/test-2.gif")
-    
-    >>> reachable_tiles(t, (2, 2), 2) == set([(2, 0), (1, 1), (2, 1), (3, 1),
-    ... (0, 2), (1, 2), (2, 2), (3, 2), (4, 2), (1, 3), (2, 3), (3, 3), 
-    ... (2, 4)])
-    True
-    
-    >>> t = TileMap("assets/tiles.png", 20, 20)
-    >>> t.load_from_file("maps/test-3.gif")
-    >>> cost = lambda c: 1
-    >>> passable = lambda c: t.tile_data(c).passable
-   
-    >>> reachable_tiles(t, (2, 0), 6, cost, passable) == set([(3, 0), (2, 0),
-    ... (1, 0), (0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (2, 2)])
-    True
-    """
-    # tiles to check (tuples of x, y)
-    todo = pqueue.PQueue()
-    todo.update(start, 0)
-    
-    # tiles we've been to
-    visited = set()
-    
-    # tiles which we can get to within max_cost
-    reachable = set()
-    reachable.add(start)
-    
-    while todo:
-        cur, c = todo.pop_smallest()
-        visited.add(cur)
-        
-        # it's too expensive to get here, so don't bother checking
-        if c > max_cost:
-            continue
-        
-        # check neighbours
-        for n in graph.neighbours(cur):
-            # skip it if it doesn't exist, if we've already checked it, or
-            # if it isn't passable
-            if ((n in visited) or
-                (not passable(n))):
-                continue
-            
-            # try updating the tile's cost
-            new_cost = c + cost(cur)
-            if todo.update(n, new_cost) and new_cost <= max_cost:
-                reachable.add(n)
-    
-    return reachable
+            pygame.gfxdraw.hline(self.image, 0, area.w, y, GRID_COLOR)
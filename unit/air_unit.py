@@ -1,14 +1,13 @@
 from unit.base_unit import BaseUnit
 from unit.carrier import Carrier
 import unit, helper
-from tiles import Tile
-import pygame
+from terrain import Tile
 
 # Layer of air units
 AIR_LAYER = 5
 
-# Rectangle for fuel indicator
-FUEL_RECT = pygame.Rect(1, 1, 8, 5)
+# Rectangle for fuel indicator, as (x, y, width, height) within the sprite
+FUEL_RECT = (1, 1, 8, 5)
 
 # Percentage of fuel remaining before the indicator changes colour
 
@@ -29,6 +28,8 @@ class AirUnit(BaseUnit):
     - Only collides with other air units
     - Does not get tile bonuses
     """
+    layer = AIR_LAYER
+    
     def __init__(self, **keywords):
         #Number of turns worth of remaining fuel.
         self.max_fuel = 1
@@ -53,24 +54,18 @@ class AirUnit(BaseUnit):
         """
         return self._fuel
         
-    def _update_image(self):
+    def fuel_gauge(self):
         """
-        Redraws the unit's image.
+        Returns the fuel indicator's fill width and its colours. Fuel amounts
+        which give the same indicator share a sprite.
         """
-        super()._update_image()
-        
         # Determine percent of fuel remaining
         fuel_percent = self.fuel / self.max_fuel
         
-        # Get the rectangle for the inside of the indicator
-        inner_rect = pygame.Rect(FUEL_RECT.left + 1,
-                                 FUEL_RECT.top + 1,
-                                 FUEL_RECT.width - 2,
-                                 FUEL_RECT.height - 2)
-        
-        # Shrink it depending on the amount of fuel remaining
-        inner_rect.w -= inner_rect.w * (1 - fuel_percent)
-        if inner_rect.w < 1: inner_rect.w = 1
+        # Shrink the inside depending on the amount of fuel remaining
+        inner_w = FUEL_RECT[2] - 2
+        inner_w = round(inner_w - inner_w * (1 - fuel_percent))
+        if inner_w < 1: inner_w = 1
         
         # Determine the colours to use
         if self.fuel > FUEL_BAD_CUTOFF:
@@ -82,17 +77,21 @@ class AirUnit(BaseUnit):
             fill = FUEL_FILL_COLOUR
         else:
             fill = FUEL_FILL_COLOUR_HALF
+            
+        return (inner_w, back, fill)
+        
+    def sprite_key(self):
+        """
+        Returns a key which identifies what the unit's image looks like.
+        """
+        return super().sprite_key() + self.fuel_gauge()
         
-        # Draw the indicator
-        pygame.gfxdraw.box(self.image, FUEL_RECT, back)
-        pygame.gfxdraw.box(self.image, inner_rect, fill)
-    
     def is_docked(self, pos):
         """
         Checks if the given position is currently adjacent to a carrier of the
         same team.
         """
-        for u in BaseUnit.active_units:
+        for u in self.roster:
             if (u.team == self.team and
                 isinstance(u, Carrier) and
                 helper.manhattan_dist((u.tile_x, u.tile_y), pos) <= 1):
@@ -102,14 +101,6 @@ class AirUnit(BaseUnit):
         # No carriers
         return False
         
-    def activate(self):
-        """
-        Adds this unit to the active roster. Sets it to a higher layer so that
-        it draws on top of other units.
-        """
-        super().activate()
-        BaseUnit.active_units.change_layer(self, AIR_LAYER)
-        
     def is_stoppable(self, tile, pos):
         """
         Returns whether or not a unit can stop on a certain tile.
@@ -136,10 +127,9 @@ class AirUnit(BaseUnit):
         
     def set_fuel(self, fuel):
         """
-        Changes the fuel amount and updates the graphic.
+        Changes the fuel amount.
         """
         self._fuel = fuel
-        self._update_image()
         
     def can_turn_end(self):
         """
@@ -184,7 +174,7 @@ class AirUnit(BaseUnit):
             return False
             
         # We can't pass through enemy air units.
-        u = BaseUnit.get_unit_at_pos(pos)
+        u = self.roster.unit_at(pos)
         if u and u.team != self.team and isinstance(u, AirUnit):
             return False
 
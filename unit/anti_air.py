@@ -1,7 +1,6 @@
 from unit.ground_unit import GroundUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class AntiAir(GroundUnit):
     """
@@ -18,12 +17,9 @@ class AntiAir(GroundUnit):
     - Moves very slowly on mountains.
     - Too large to move through forests.
     """
-    sprite = pygame.image.load("assets/anti_air.png")
+    sprite_file = "assets/anti_air.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = AntiAir.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -38,7 +34,7 @@ class AntiAir(GroundUnit):
         self.damage = 2
         self.bonus_damage = 7
         self.defense = 2
-        self.hit_effect = effects.Ricochet
+        self.hit_effect = "Ricochet"
         
         self._move_costs = {'plains': 1.5,
                              'sand': 1.5,
@@ -1,7 +1,6 @@
 from unit.ground_unit import GroundUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class AntiArmour(GroundUnit):
     """
@@ -20,12 +19,9 @@ class AntiArmour(GroundUnit):
     - Can move through any land terrain.
     - Can't hit air units.
     """
-    sprite = pygame.image.load("assets/anti_armour.png")
+    sprite_file = "assets/anti_armour.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = AntiArmour.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -40,7 +36,7 @@ class AntiArmour(GroundUnit):
         self.damage = 4
         self.bonus_damage = 4
         self.defense = 0
-        self.hit_effect = effects.Explosion
+        self.hit_effect = "Explosion"
         
         self._move_costs = {'mountain': 2,
                              'forest': 1.5,
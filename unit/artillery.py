@@ -1,7 +1,6 @@
 from unit.ground_unit import GroundUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Artillery(GroundUnit):
     """
@@ -20,12 +19,9 @@ class Artillery(GroundUnit):
     - Too large to move through forests.
     - Can't hit air units.
     """
-    sprite = pygame.image.load("assets/artillery.png")
+    sprite_file = "assets/artillery.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Artillery.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -40,7 +36,7 @@ class Artillery(GroundUnit):
         self.min_atk_range = 3
         self.damage = 7
         self.defense = 1
-        self.hit_effect = effects.Explosion
+        self.hit_effect = "Explosion"
         
         self._move_costs = {'plains': 1.5,
                              'sand': 1.5,
@@ -1,23 +1,171 @@
-import pygame, unit, helper, bmpfont, effects
-from pygame.sprite import Sprite
+import bisect, itertools
+import unit, helper
 
 FRAME_MOVE_SPEED = 3/20
-SIZE = 20
 
-class BaseUnit(Sprite):
+class UnitRoster:
+    """
+    The units in play, kept in drawing order: by layer, and then in the
+    order they were added. The units on each tile are kept too, so adding,
+    removing and finding a unit, or the unit on a tile, take the same time
+    however many units there are. Units tell their roster when they move.
+    
+    >>> class Marker:
+    ...     def __init__(self, layer, pos):
+    ...         self.layer, self.tile_pos = layer, pos
+    >>> roster = UnitRoster()
+    >>> a, b, c = Marker(0, (1, 1)), Marker(5, (1, 1)), Marker(0, (2, 1))
+    >>> for u in (a, b, c): roster.add(u)
+    >>> list(roster) == [a, c, b]
+    True
+    >>> roster.unit_at((1, 1)) is a, roster.unit_at((3, 3))
+    (True, None)
+    >>> roster.remove(a)
+    >>> len(roster), a in roster, roster.unit_at((1, 1)) is b
+    (2, False, True)
+    >>> c.tile_pos = (3, 3)
+    >>> roster.unit_moved(c, (2, 1))
+    >>> roster.unit_at((2, 1)), roster.unit_at((3, 3)) is c
+    (None, True)
+    """
+    
+    def __init__(self):
+        # The units on each layer, in the order they were added. Dictionary
+        # keys keep that order while still being quick to find and remove.
+        self._layers = {}
+        
+        # The layer numbers, lowest first
+        self._layer_order = []
+        self._count = 0
+        
+        # The units on each tile position, in the order they arrived
+        self._positions = {}
+        
+    def __iter__(self):
+        return itertools.chain.from_iterable(
+            [self._layers[layer] for layer in self._layer_order])
+        
+    def __len__(self):
+        return self._count
+        
+    def __contains__(self, u):
+        return u in self._layers.get(u.layer, ())
+        
+    def add(self, u):
+        """
+        Adds a unit above every unit on its layer or a lower one. Does
+        nothing if it's already in the roster.
+        """
+        units = self._layers.get(u.layer)
+        if units is None:
+            units = self._layers[u.layer] = {}
+            bisect.insort(self._layer_order, u.layer)
+        
+        if u not in units:
+            units[u] = None
+            self._count += 1
+            self._positions.setdefault(u.tile_pos, []).append(u)
+        
+    def remove(self, u):
+        """
+        Removes a unit. Does nothing if it isn't in the roster.
+        """
+        units = self._layers.get(u.layer)
+        if units and u in units:
+            del units[u]
+            self._count -= 1
+            self._leave(u, u.tile_pos)
+            
+    def _leave(self, u, pos):
+        """
+        Takes a unit off the list of units at the given position.
+        """
+        here = self._positions[pos]
+        here.remove(u)
+        if not here:
+            del self._positions[pos]
+            
+    def unit_moved(self, u, old_pos):
+        """
+        Moves a unit in the roster from old_pos to its current position.
+        """
+        if u in self:
+            self._leave(u, old_pos)
+            self._positions.setdefault(u.tile_pos, []).append(u)
+            
+    def clear(self):
+        """
+        Removes every unit.
+        """
+        self._layers.clear()
+        self._layer_order.clear()
+        self._count = 0
+        self._positions.clear()
+        
+    def unit_at(self, pos):
+        """
+        Returns the unit at the given tile position, or None if no unit is
+        present. If there are several, the one on the lowest layer is
+        returned.
+        """
+        here = self._positions.get(pos)
+        if not here:
+            return None
+        
+        return min(here, key = lambda u: u.layer)
+        
+    def update(self):
+        """
+        Moves every unit which is following a path along it.
+        """
+        for u in self:
+            u.update()
+
+class UnitClass(type):
+    """
+    The type of every unit class. version counts the unit classes made and
+    the changes to their attributes and methods, so that anything worked
+    out from units' stats can tell when to work it out again.
+    
+    >>> version = UnitClass.version
+    >>> BaseUnit.layer = 0
+    >>> UnitClass.version > version
+    True
+    """
+    
+    version = 0
+    
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        UnitClass.version += 1
+        
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        UnitClass.version += 1
+        
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        UnitClass.version += 1
+
+class BaseUnit(metaclass = UnitClass):
     """
     The basic representation of a unit from which all other unit types
-    extend. Has a graphical representation and moves around the screen as well
-    as storing and calculating information regarding movement and attacks for
-    its unit type.
+    extend. Stores and calculates information regarding movement and attacks
+    for its unit type, and moves along paths a step at a time so that its
+    movement can be shown.
     
-    Note: self._base_image MUST be set in subclasses! This is the tilesheet
-    from which the unit renders its actual image.
+    Units don't hold any graphics. sprite_file names the sprite sheet the
+    unit is drawn from, which is only loaded when the unit is first drawn.
     """
     
-    active_units = pygame.sprite.LayeredUpdates()
+    # The roster units join when they don't belong to a particular game
+    active_units = UnitRoster()
     
-    health_font = bmpfont.BitmapFont("assets/healthfont.png", 6, 7, 48)
+    # The sprite sheet of each team's version of the unit
+    sprite_file = None
+    
+    # Units on higher layers are drawn on top
+    layer = 0
     
     def __init__(self,
                  team = -1,
@@ -25,16 +173,19 @@ class BaseUnit(Sprite):
                  tile_y = None,
                  angle = 0,
                  activate = False,
+                 roster = None,
                  **keywords):
 
-        Sprite.__init__(self)
-        
         #Take the keywords off
         self.team = team
-        self.tile_x = tile_x
-        self.tile_y = tile_y
+        self._tile_x = tile_x
+        self._tile_y = tile_y
         self._angle = angle
         
+        # The roster of the game this unit is in, which it joins when
+        # activated and searches for other units
+        self.roster = BaseUnit.active_units if roster is None else roster
+        
         #Some default values so that nothing complains when trying to
         #assign later
         self._moving = False
@@ -51,8 +202,8 @@ class BaseUnit(Sprite):
         self.defense = 3
         self.type = "Base Unit"
         self.hit_effect = None
-        self.die_effect = effects.Explosion
-        self.kill_effect = effects.Explosion
+        self.die_effect = "Explosion"
+        self.kill_effect = "Explosion"
         self.move_sound = None
         self.hit_sound = None
         self.die_sound = "Explosion"
@@ -61,25 +212,16 @@ class BaseUnit(Sprite):
         #Dictionary of movement costs by tile type name
         self._move_costs = {}
         
-        #set required pygame things.
-        self.image = None
-        self.rect = pygame.Rect(0, 0, SIZE, SIZE)
-        self._update_image()
-        
         if activate:
             self.activate()
             
     @staticmethod
     def get_unit_at_pos(pos):
         """
-        Returns the active unit at the given tile position, or None if no unit
-        is present.
+        Returns the unit at the given tile position in the default roster, or
+        None if no unit is present.
         """
-        for u in BaseUnit.active_units:
-            if (u.tile_x, u.tile_y) == pos:
-                return u
-        
-        return None
+        return BaseUnit.active_units.unit_at(pos)
     
     @property
     def active(self):
@@ -119,63 +261,67 @@ class BaseUnit(Sprite):
         elif angle == 270:
             return "South"
             
+    @property
+    def tile_x(self):
+        """
+        The unit's x position, in tiles.
+        """
+        return self._tile_x
+        
+    @tile_x.setter
+    def tile_x(self, x):
+        self.set_tile_pos(x, self._tile_y)
+        
+    @property
+    def tile_y(self):
+        """
+        The unit's y position, in tiles.
+        """
+        return self._tile_y
+        
+    @tile_y.setter
+    def tile_y(self, y):
+        self.set_tile_pos(self._tile_x, y)
+        
     @property
     def tile_pos(self):
         """
         Returns the unit's tile position.
         """
-        return (self.tile_x, self.tile_y)
-                
-    def _update_image(self):
-        """
-        Re-renders the unit's image.
-        """
-        # Pick out the right sprite depending on the team
-        subrect = pygame.Rect(self.team * SIZE,
-                              0,
-                              self.rect.w,
-                              self.rect.h)
-        try:
-            subsurf = self._base_image.subsurface(subrect)
-        except ValueError:
-            # No sprite for this team
-            raise ValueError(
-                "Class {} does not have a sprite for team {}!".format(
-                    self.__class__.__name__, self.team))
-        except AttributeError:
-            # No image is loaded
-            return
+        return (self._tile_x, self._tile_y)
         
-        # Rotate the sprite
-        self.image = pygame.transform.rotate(subsurf, self._angle)
-
-        # Render the health.
-        health_surf = BaseUnit.health_font.render(str(int(self.health)))
-        
-        # Move the health to the bottom-right of the image.
-        image_rect = self.image.get_rect()
-        health_rect = health_surf.get_rect()
-        health_rect.move_ip(image_rect.w - health_rect.w,
-                            image_rect.h - health_rect.h)
-                            
-        # Draw the health on to the image.
-        self.image.blit(health_surf, health_rect)
+    def set_tile_pos(self, x, y):
+        """
+        Moves the unit to the given tile position, keeping its roster's
+        record of where it is up to date.
+        """
+        old_pos = (self._tile_x, self._tile_y)
+        self._tile_x, self._tile_y = x, y
+        if self._active:
+            self.roster.unit_moved(self, old_pos)
+                
+    def sprite_key(self):
+        """
+        Returns a key which identifies what the unit's image looks like.
+        Units with equal keys are drawn the same way.
+        """
+        return (self.__class__, self.team, self._angle, int(self.health))
         
     def activate(self):
         """
-        Adds this unit to the active roster.
+        Adds this unit to its roster.
         """
         if not self._active:
             self._active = True
-            BaseUnit.active_units.add(self)
+            self.roster.add(self)
     
     def deactivate(self):
         """
-        Removes this unit from the active roster.
+        Removes this unit from its roster.
         """
         if self._active:
             self._active = False
-            BaseUnit.active_units.remove(self)
+            self.roster.remove(self)
             
     def face_vector(self, vector):
         """
@@ -231,8 +377,7 @@ class BaseUnit(Sprite):
 
     def update(self):
         """
-        Overrides the update function of the Sprite class.
-        Handles movement.
+        Moves the unit a step along its path. Called once per frame.
         """
         if self._moving:
             #checks if path is empty
@@ -263,8 +408,7 @@ class BaseUnit(Sprite):
                 self.face_vector((dx, dy))
 
                 #set the new value
-                self.tile_x += dx
-                self.tile_y += dy
+                self.set_tile_pos(self.tile_x + dx, self.tile_y + dy)
 
     def set_path(self, path):
         """
@@ -282,14 +426,27 @@ class BaseUnit(Sprite):
         #set the path
         self._path = path
         
+    def move_to(self, path):
+        """
+        Moves the unit straight to the end of a path, facing the way it
+        would have been after following it, rather than a step per frame.
+        
+        >>> u = BaseUnit(tile_x = 0, tile_y = 0)
+        >>> u.move_to([(0, 0), (1, 0), (1, 1)])
+        >>> u.tile_pos, u.direction
+        ((1, 1), 'South')
+        """
+        if len(path) > 1:
+            (from_x, from_y), (to_x, to_y) = path[-2:]
+            self.face_vector((to_x - from_x, to_y - from_y))
+        
+        self.set_tile_pos(*path[-1])
+        
     def set_angle(self, angle):
         """
-        Sets the sprite's new angle, rotating the graphic at the same
-        time. Does nothing if the sprite is already at that angle.
+        Sets the unit's new angle.
         """
-        if self._angle == angle: return
         self._angle = angle
-        self._update_image()
         
     def hurt(self, damage):
         """
@@ -302,9 +459,6 @@ class BaseUnit(Sprite):
         if self.health <= 0:
             self.deactivate()
         
-        # Update the health graphic.
-        self._update_image()
-        
     def move_cost(self, tile):
         """
         Returns the cost of a unit moving over a certain tile.
@@ -341,9 +495,8 @@ class BaseUnit(Sprite):
         Override this for subclasses, perhaps using this as the default value.
         """
         # Can't park on a unit
-        for u in BaseUnit.active_units:
-            if (u.tile_x, u.tile_y) == pos:
-                return False
+        if self.roster.unit_at(pos):
+            return False
         
         return self.is_passable(tile, pos)
         
@@ -381,7 +534,7 @@ class BaseUnit(Sprite):
             return False
         
         # Get the unit we're going to attack.
-        u = BaseUnit.get_unit_at_pos(to_pos)
+        u = self.roster.unit_at(to_pos)
         
         # We can't attack if there's no unit there, if it's on our team,
         # if we can't hit this particular unit, or if the damage is 0
@@ -1,7 +1,6 @@
 from unit.water_unit import WaterUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Battleship(WaterUnit):
     """
@@ -17,12 +16,9 @@ class Battleship(WaterUnit):
     - Despite its high stats, this unit is constrained to the water, so its
       uses are fairly specialized.
     """
-    sprite = pygame.image.load("assets/battleship.png")
+    sprite_file = "assets/battleship.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Battleship.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -35,6 +31,6 @@ class Battleship(WaterUnit):
         self.max_atk_range = 4
         self.damage = 6
         self.defense = 3
-        self.hit_effect = effects.Explosion
+        self.hit_effect = "Explosion"
 
 unit.unit_types["Battleship"] = Battleship
@@ -1,7 +1,6 @@
 from unit.air_unit import AirUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Bomber(AirUnit):
     """
@@ -22,12 +21,9 @@ class Bomber(AirUnit):
     - When firing at ground and water units this unit does more damage.
     - Can't hit air units.
     """
-    sprite = pygame.image.load("assets/bomber.png")
+    sprite_file = "assets/bomber.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Bomber.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -45,7 +41,7 @@ class Bomber(AirUnit):
         self.max_fuel = 10
         self.set_fuel(self.max_fuel)
         self.min_move_distance = 4
-        self.hit_effect = effects.Explosion
+        self.hit_effect = "Explosion"
         
     def get_damage(self, target, target_tile):
         """
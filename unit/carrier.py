@@ -1,7 +1,6 @@
 from unit.water_unit import WaterUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Carrier(WaterUnit):
     """
@@ -17,12 +16,9 @@ class Carrier(WaterUnit):
     - Aircraft can stop moving and refuel on any of the 4 tiles adjacent to this
       unit.
     """
-    sprite = pygame.image.load("assets/carrier.png")
+    sprite_file = "assets/carrier.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Carrier.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -35,6 +31,6 @@ class Carrier(WaterUnit):
         self.max_atk_range = 2
         self.damage = 4
         self.defense = 2
-        self.hit_effect = effects.Ricochet
+        self.hit_effect = "Ricochet"
 
 unit.unit_types["Carrier"] = Carrier
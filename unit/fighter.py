@@ -1,7 +1,6 @@
 from unit.air_unit import AirUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Fighter(AirUnit):
     """
@@ -20,12 +19,9 @@ class Fighter(AirUnit):
       in time!
     - When firing at another air unit, this unit does extra damage.
     """
-    sprite = pygame.image.load("assets/fighter.png")
+    sprite_file = "assets/fighter.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Fighter.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -42,7 +38,7 @@ class Fighter(AirUnit):
         self.max_fuel = 7
         self.set_fuel(self.max_fuel)
         self.min_move_distance = 6
-        self.hit_effect = effects.Ricochet
+        self.hit_effect = "Ricochet"
         
     def get_damage(self, target, target_tile):
         """
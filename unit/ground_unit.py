@@ -1,7 +1,6 @@
 from unit.base_unit import BaseUnit
 import unit, helper
-from tiles import Tile
-import pygame
+from terrain import Tile
 
 class GroundUnit(BaseUnit):
     """
@@ -26,7 +25,7 @@ class GroundUnit(BaseUnit):
             return False
             
         # We can't pass through enemy units.
-        u = BaseUnit.get_unit_at_pos(pos)
+        u = self.roster.unit_at(pos)
         if u and u.team != self.team and isinstance(u, GroundUnit):
             return False
         
@@ -1,7 +1,6 @@
 from unit.ground_unit import GroundUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Jeep(GroundUnit):
     """
@@ -18,12 +17,9 @@ class Jeep(GroundUnit):
       other terrain type will decrease its speed. Forests and mountains are
       especially difficult to traverse.
     """
-    sprite = pygame.image.load("assets/jeep.png")
+    sprite_file = "assets/jeep.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Jeep.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -37,7 +33,7 @@ class Jeep(GroundUnit):
         self.max_atk_range = 2
         self.damage = 5
         self.defense = 1
-        self.hit_effect = effects.Ricochet
+        self.hit_effect = "Ricochet"
         
         self._move_costs = {'plains': 2,
                              'sand': 3,
@@ -1,7 +1,6 @@
 from unit.jeep import Jeep
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class SuperJeep(Jeep):
     """
@@ -1,7 +1,6 @@
 from unit.ground_unit import GroundUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Tank(GroundUnit):
     """
@@ -19,12 +18,9 @@ class Tank(GroundUnit):
       that it can pass.
     - Can't hit air units.
     """
-    sprite = pygame.image.load("assets/tank.png")
+    sprite_file = "assets/tank.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Tank.sprite
-
         #load the base class
         super().__init__(**keywords)
 
@@ -38,7 +34,7 @@ class Tank(GroundUnit):
         self.max_atk_range = 5
         self.damage = 7
         self.defense = 3
-        self.hit_effect = effects.Explosion
+        self.hit_effect = "Explosion"
         
     def is_passable(self, tile, pos):
         """
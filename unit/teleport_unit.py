@@ -1,8 +1,6 @@
 from unit.base_unit import BaseUnit
-import unit, helper, effects
-from tiles import Tile
-from animation import Animation
-import pygame
+import unit, helper
+from terrain import Tile
 
 FRAME_MOVE_SPEED = 3/20
 SIZE = 20
@@ -22,9 +20,9 @@ class TeleportUnit(BaseUnit):
         self.type = "Teleport Unit"
         self.hit_sound = "Wormhole"
         self.move_sound = "Wormhole"
-        self.hit_effect = effects.Wormhole
-        self.kill_effect = effects.Wormhole
-        self.move_animation = effects.Wormhole
+        self.hit_effect = "Wormhole"
+        self.kill_effect = "Wormhole"
+        self.move_animation = "Wormhole"
         
     def is_stoppable(self, tile, pos):
         """
@@ -38,10 +36,15 @@ class TeleportUnit(BaseUnit):
             
         return super().is_stoppable(tile, pos)
 
+    def move_to(self, path):
+        """
+        Teleports straight to the end of a path without turning.
+        """
+        self.set_tile_pos(*path[-1])
+        
     def update(self):
         """
-        Overrides the update function of the Sprite class.
-        Handles movement.
+        Teleports the unit to the end of its path. Called once per frame.
         """
         if self._moving:
             #checks if path is empty
@@ -66,6 +69,5 @@ class TeleportUnit(BaseUnit):
                 path_x, path_y = self._path[0]
 
                 #set the new value
-                self.tile_x = path_x
-                self.tile_y = path_y
+                self.set_tile_pos(path_x, path_y)
 
@@ -1,7 +1,6 @@
 from unit.teleport_unit import TeleportUnit
-import unit, helper, effects
-from tiles import Tile
-import pygame
+import unit, helper
+from terrain import Tile
 
 class Warper(TeleportUnit):
     """
@@ -21,12 +20,9 @@ class Warper(TeleportUnit):
    
     
     """
-    sprite = pygame.image.load("assets/novavangard.png")
+    sprite_file = "assets/novavangard.png"
     
     def __init__(self, **keywords):
-        #load the image for the base class.
-        self._base_image = Warper.sprite
-
         #load the base class
         super().__init__(**keywords)
         
@@ -1,7 +1,6 @@
 from unit.teleport_unit import TeleportUnit 
-import unit, helper, effects
-from tiles import Tile 
-import pygame
+import unit, helper
+from terrain import Tile 
 
 class Water_warper(TeleportUnit):
 
@@ -18,12 +17,9 @@ class Water_warper(TeleportUnit):
 
 	"""
 
-	sprite = pygame.image.load("assets/novaangler.png")
+	sprite_file = "assets/novaangler.png"
 
 	def __init__(self, **keywords):
-		#load the image for the base class.
-		self._base_image = Water_warper.sprite
-
 		#load the base class 
 		super().__init__(**keywords)
 
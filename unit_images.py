@@ -0,0 +1,100 @@
+import pygame
+import pygame.gfxdraw
+import bmpfont, cache
+from images import ImageManager
+from unit.air_unit import AirUnit, FUEL_RECT
+
+# The size of each team's sprite in a unit's sprite sheet
+SIZE = 20
+
+# Number of composed unit images to keep around
+SPRITE_CACHE_SIZE = 512
+
+class UnitImages:
+    """
+    Draws units. Units don't hold any graphics themselves, so their images
+    are rendered here. A unit type's sprite sheet is only loaded once a unit
+    of that type is drawn, and units which look the same share an image.
+    """
+
+    health_font = bmpfont.BitmapFont("assets/healthfont.png", 6, 7, 48)
+
+    # Composed images shared by every unit which looks the same
+    sprite_cache = cache.LRUCache(SPRITE_CACHE_SIZE)
+
+    @staticmethod
+    def get(u):
+        """
+        Returns the image of the given unit, only rendering it if no unit
+        has been drawn this way before.
+
+        >>> from unit.tank import Tank
+        >>> a = Tank(team = 1, angle = 90)
+        >>> b = Tank(team = 1, angle = 90)
+        >>> UnitImages.get(a) is UnitImages.get(b)
+        True
+        >>> b.hurt(3)
+        >>> UnitImages.get(a) is UnitImages.get(b)
+        False
+        """
+        return UnitImages.sprite_cache.get_or_create(
+            u.sprite_key(),
+            lambda: UnitImages.render(u))
+
+    @staticmethod
+    def render(u):
+        """
+        Renders a new image of the given unit. The returned surface is
+        shared between units, so it must not be changed afterward. Returns
+        None for units without a sprite sheet.
+        """
+        if not u.sprite_file:
+            return None
+
+        # Pick out the right sprite depending on the team
+        subrect = pygame.Rect(u.team * SIZE, 0, SIZE, SIZE)
+        try:
+            subsurf = ImageManager.load(u.sprite_file).subsurface(subrect)
+        except ValueError:
+            # No sprite for this team
+            raise ValueError(
+                "Class {} does not have a sprite for team {}!".format(
+                    u.__class__.__name__, u.team))
+
+        # Rotate the sprite
+        image = pygame.transform.rotate(subsurf, u.angle)
+
+        # Render the health.
+        health_surf = UnitImages.health_font.render(str(int(u.health)))
+
+        # Move the health to the bottom-right of the image.
+        image_rect = image.get_rect()
+        health_rect = health_surf.get_rect()
+        health_rect.move_ip(image_rect.w - health_rect.w,
+                            image_rect.h - health_rect.h)
+
+        # Draw the health on to the image.
+        image.blit(health_surf, health_rect)
+
+        # Aircraft also show how much fuel they have left
+        if isinstance(u, AirUnit):
+            UnitImages._draw_fuel_gauge(image, u)
+
+        return image
+
+    @staticmethod
+    def _draw_fuel_gauge(image, u):
+        """
+        Draws an air unit's fuel indicator on to its image.
+        """
+        # Get the rectangle for the inside of the indicator
+        fuel_rect = pygame.Rect(FUEL_RECT)
+        inner_w, back, fill = u.fuel_gauge()
+        inner_rect = pygame.Rect(fuel_rect.left + 1,
+                                 fuel_rect.top + 1,
+                                 inner_w,
+                                 fuel_rect.height - 2)
+
+        # Draw the indicator
+        pygame.gfxdraw.box(image, fuel_rect, back)
+        pygame.gfxdraw.box(image, inner_rect, fill)